@@ -0,0 +1,71 @@
+"""Benchmark the cost of binding match values in with blocks.
+
+Run it with every interpreter to compare the binding backends, e.g. the ctypes
+``PyFrame_LocalsToFast`` path of Python <= 3.12 against the PEP 667
+write-through ``FrameLocalsProxy`` of Python 3.13+::
+
+    python3.12 benchmarks/bench_binding.py
+    python3.13 benchmarks/bench_binding.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from pyopm.core import ObjectPattern, BINDING_BACKEND, locals_to_fast
+
+
+class Record:
+    # pylint: disable=too-few-public-methods,missing-class-docstring
+    def __init__(self, n):
+        for i in range(n):
+            setattr(self, f'v{i}', i)
+
+
+def with_block(m):
+    v0 = v1 = None  # pylint: disable=unused-variable
+    with m:
+        pass
+
+
+def write_per_variable(names):
+    """The pre-batching path: re-read f_locals and sync after every single write."""
+    v0 = None  # pylint: disable=unused-variable
+    frame = sys._getframe()  # pylint: disable=protected-access
+    for name in names:
+        frame.f_locals[name] = 1
+        locals_to_fast(frame)
+
+
+def write_batched(names):
+    """The current path: one f_locals snapshot (or proxy), a single sync."""
+    v0 = None  # pylint: disable=unused-variable
+    frame = sys._getframe()  # pylint: disable=protected-access
+    f_locals = frame.f_locals
+    for name in names:
+        f_locals[name] = 1
+    locals_to_fast(frame)
+
+
+def bench(label, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    print(f'{label:<40} {best / number * 1e6:8.2f} us/op   {number / best:12.0f} ops/s')
+
+
+def main(number=20000):
+    print(f'Python {sys.version.split()[0]} ({sys.implementation.name}), '
+          f'binding backend: {BINDING_BACKEND}')
+    for n in (1, 6, 20):
+        pattern = ObjectPattern({f'obj.v{i}': {'bind': {f'v{i}': None}} for i in range(n)})
+        m = pattern.match(Record(n))
+        names = [f'v{i}' for i in range(n)]
+        bench(f'with block, {n:>2} bindings', lambda: with_block(m), number)
+        bench(f'raw writes, {n:>2} names, sync per write', lambda: write_per_variable(names),
+              number)
+        bench(f'raw writes, {n:>2} names, batched', lambda: write_batched(names), number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark the time ``import pyopm`` takes in a fresh interpreter.
+
+Every run starts a new interpreter with ``-X importtime`` and reads the
+cumulative time of the pyopm package; the median of the runs is reported,
+together with the slow modules that got imported along. The exit code is 1 if
+the median exceeds the budget or if one of the deferred modules was imported::
+
+    python benchmarks/bench_import.py                 # 20 runs, 60 ms budget
+    python benchmarks/bench_import.py -n 50 --budget 40
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+import typing as T
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# imported on first use only: importing pyopm must not load them
+DEFERRED = ('asyncio', 'ctypes', 'concurrent.futures', 'multiprocessing', 'inspect', 'pprint',
+            'textwrap', 'tempfile', 'hashlib', 'linecache', 'pyopm.aio', 'pyopm.parallel',
+            'pyopm.registry', 'pyopm.casematch', 'pyopm.overloading')
+_TOTAL = re.compile(r'import time:\s*\d+ \|\s*(\d+) \| pyopm$', re.M)  # top level only
+
+
+def import_once(python: T.Text = sys.executable) -> T.Tuple[float, T.List[T.Text]]:
+    """(cumulative import time of pyopm in ms, the deferred modules that got imported)."""
+    code = 'import sys, pyopm; print(" ".join(sys.modules))'
+    proc = subprocess.run([python, '-X', 'importtime', '-c', code], cwd=ROOT, check=True,
+                          capture_output=True, text=True,
+                          env={**os.environ, 'PYTHONDONTWRITEBYTECODE': ''})
+    m = _TOTAL.search(proc.stderr)
+    if m is None:
+        raise RuntimeError(f'no import time found for pyopm:\n{proc.stderr}')
+    modules = set(proc.stdout.split())
+    return int(m.group(1)) / 1000, [name for name in DEFERRED if name in modules]
+
+
+def main(argv: T.Optional[T.List[T.Text]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('--budget', type=float, default=60.0, help='milliseconds')
+    parser.add_argument('--python', default=sys.executable)
+    args = parser.parse_args(argv)
+
+    import_once(args.python)  # write the bytecode caches first
+    times, loaded = [], set()
+    for _ in range(args.runs):
+        ms, modules = import_once(args.python)
+        times.append(ms)
+        loaded.update(modules)
+    median = statistics.median(times)
+    print(f'import pyopm: median {median:.1f} ms, min {min(times):.1f} ms, '
+          f'max {max(times):.1f} ms ({args.runs} runs, budget {args.budget:.0f} ms)')
+    if loaded:
+        print(f'deferred modules imported: {", ".join(sorted(loaded))}')
+    return int(median > args.budget or bool(loaded))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""Offline benchmark suite for pyopm.
+
+Covers single patterns (wide, deep, succeeding and failing), compiled matchers,
+pattern sets from 10 to 10k patterns (ObjectMultiPattern, PatternRegistry),
+batch matching and with block entry/exit. For every benchmark it reports ops/s,
+the peak memory allocated while running one op (its transient allocations, with
+the result discarded) and the memory retained per kept result (bytes and
+allocated blocks per op).
+
+Usage::
+
+    python benchmarks/suite.py                       # run and print
+    python benchmarks/suite.py --save base.json      # store a baseline
+    python benchmarks/suite.py --compare base.json   # compare against it
+    python benchmarks/suite.py --quick -k multi      # fewer ops, filter names
+
+With ``--compare``, the exit code is 1 if any benchmark got slower than the
+threshold (default: 10%).
+"""
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import typing as T
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from pyopm.core import ObjectPattern, ObjectMultiPattern
+from pyopm.registry import PatternRegistry
+from pyopm.predicates import Eq, IsInstance
+
+BENCHMARKS: T.Dict[T.Text, T.Callable[[], T.Callable[[], T.Any]]] = {}
+
+
+def benchmark(name: T.Text):
+    """Register a benchmark: a setup function returning the operation to time."""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+class Obj:
+    # pylint: disable=too-few-public-methods,missing-class-docstring
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+PD6 = {'obj.a': {'bind': {'a': None}}, 'obj.b': {'bind': {'b': None}},
+       'obj.c': {'bind': {'c': None}}, 'obj.d': {'bind': {'d': None}},
+       'obj.e': {'bind': {'e': None}}, 'obj.f': {'bind': {'f': None}}}
+WIDE_OK = Obj(a=1, b=2, c=3, d=4, e=5, f=6)
+WIDE_FAIL = Obj(a=1, b=2)  # obj.c is missing
+
+
+def deep_object(depth: int) -> Obj:
+    o = Obj(value=depth)
+    for _ in range(depth):
+        o = Obj(child=o)
+    return o
+
+
+DEEP_KEY = 'obj' + '.child' * 10
+DEEP = {DEEP_KEY: {'bind': {'leaf': None}},
+        DEEP_KEY + '.value': {'eval': [lambda v: v == 0], 'bind': {'value': None}}}
+
+
+@benchmark('match/wide-pd6/success')
+def _wide_success():
+    p = ObjectPattern(PD6)
+    return lambda: p.match(WIDE_OK)
+
+
+@benchmark('match/wide-pd6/failure')
+def _wide_failure():
+    p = ObjectPattern(PD6)
+    return lambda: p.match(WIDE_FAIL)
+
+
+@benchmark('match/wide-pd6/success/bound')
+def _wide_success_bound():
+    p = ObjectPattern(PD6)
+    return lambda: dict(p.match(WIDE_OK).bound)
+
+
+@benchmark('match/deep-10/success')
+def _deep_success():
+    p, o = ObjectPattern(DEEP), deep_object(10)
+    return lambda: p.match(o)
+
+
+@benchmark('match/deep-10/failure')
+def _deep_failure():
+    p, o = ObjectPattern(DEEP), deep_object(5)
+    return lambda: p.match(o)
+
+
+@benchmark('compiled/wide-pd6/success')
+def _compiled_success():
+    f = ObjectPattern(PD6).compile()
+    return lambda: f(WIDE_OK)
+
+
+@benchmark('compiled/wide-pd6/failure')
+def _compiled_failure():
+    f = ObjectPattern(PD6).compile()
+    return lambda: f(WIDE_FAIL)
+
+
+@benchmark('batch/match_many-1000/bindings')
+def _match_many():
+    p = ObjectPattern(PD6)
+    data = [WIDE_OK, WIDE_FAIL] * 500
+    return lambda: sum(1 for r in p.match_many(data, bindings_only=True) if r is not None)
+
+
+def event_patterns(n: int) -> T.List[ObjectPattern]:
+    return [ObjectPattern({'obj': {'eval': [IsInstance(Obj)]},
+                           'obj.kind': {'eval': [Eq(i)]},
+                           'obj.payload': {'bind': {'payload': None}}}) for i in range(n)]
+
+
+for _n in (10, 100, 1000, 10000):
+    def _multi_setup(n=_n, hit=True):
+        patterns = event_patterns(n)
+        o = Obj(kind=n // 2 if hit else -1, payload=None)
+        return lambda: ObjectMultiPattern(o, *patterns).successful_matches
+
+    def _registry_setup(n=_n, hit=True):
+        reg = PatternRegistry(event_patterns(n))
+        o = Obj(kind=n // 2 if hit else -1, payload=None)
+        return lambda: reg.first_match(o)
+
+    benchmark(f'multi/{_n}/success')(_multi_setup)
+    benchmark(f'multi/{_n}/failure')(lambda n=_n: _multi_setup(n, hit=False))
+    benchmark(f'registry/{_n}/success')(_registry_setup)
+    benchmark(f'registry/{_n}/failure')(lambda n=_n: _registry_setup(n, hit=False))
+
+
+@benchmark('with/wide-pd6/enter-exit')
+def _with_block():
+    m = ObjectPattern(PD6).match(WIDE_OK)
+
+    def op():
+        a = b = None  # pylint: disable=unused-variable
+        with m:
+            pass
+    return op
+
+
+@benchmark('with/multi-10/enter-exit')
+def _with_multi():
+    patterns = event_patterns(10)
+    o = Obj(kind=5, payload=1)
+
+    def op():
+        payload = None  # pylint: disable=unused-variable
+        with ObjectMultiPattern(o, *patterns):
+            pass
+    return op
+
+
+def measure(op: T.Callable[[], T.Any], min_time: float) -> T.Dict[T.Text, float]:
+    """Time op (best of 3 runs of at least min_time), its peak and retained memory per call."""
+    op()  # warm up caches (compiled patterns, networks, ...)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 3:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(2):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        best = min(best, time.perf_counter() - start)
+
+    # peak: the most memory allocated at once during a single call (results discarded)
+    count = min(number, 200)
+    tracemalloc.start()
+    peak = 0
+    for _ in range(count):
+        tracemalloc.clear_traces()  # also resets the peak: only this call is traced
+        op()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    # retained: the memory still held by the kept results
+    keep, count = [], min(number, 1000)
+    gc.collect()
+    blocks = getattr(sys, 'getallocatedblocks', lambda: 0)()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(count):
+        keep.append(op())
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    blocks = getattr(sys, 'getallocatedblocks', lambda: 0)() - blocks
+    del keep
+    return {'ops_per_sec': number / best,
+            'peak_bytes_per_op': peak,
+            'retained_bytes_per_op': max(after - before, 0) / count,
+            'retained_blocks_per_op': max(blocks, 0) / count}
+
+
+def git_revision() -> T.Optional[T.Text]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def run(names: T.Iterable[T.Text], min_time: float = 0.3,
+        out: T.TextIO = sys.stdout) -> T.Dict[T.Text, T.Any]:
+    """Run the benchmarks, print a line per benchmark and return the results."""
+    results = {}
+    for name in names:
+        r = results[name] = measure(BENCHMARKS[name](), min_time)
+        print(f'{name:<36} {r["ops_per_sec"]:>14,.0f} ops/s {r["peak_bytes_per_op"]:>8,} B peak '
+              f'{r["retained_bytes_per_op"]:>10.1f} B/op {r["retained_blocks_per_op"]:>7.1f} '
+              f'blocks/op retained', file=out)
+    return {'meta': {'python': platform.python_version(),
+                     'implementation': sys.implementation.name,
+                     'platform': platform.platform(), 'revision': git_revision(),
+                     'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def compare(current: T.Dict[T.Text, T.Any], baseline: T.Dict[T.Text, T.Any],
+            threshold: float = 0.1, out: T.TextIO = sys.stdout) -> T.List[T.Text]:
+    """Print the speed ratios against a baseline, return the regressed benchmarks."""
+    regressions = []
+    print(f'\ncompared to {baseline["meta"].get("revision")} ({baseline["meta"].get("time")}):',
+          file=out)
+    for name, r in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f'{name:<36} (new)', file=out)
+            continue
+        ratio = r['ops_per_sec'] / base['ops_per_sec']
+        flag = ''
+        if ratio < 1 - threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        peak = r['peak_bytes_per_op'] - base.get('peak_bytes_per_op', r['peak_bytes_per_op'])
+        print(f'{name:<36} {ratio:>7.2f}x speed {peak:>+8,} B peak{flag}', file=out)
+    return regressions
+
+
+def main(argv: T.Optional[T.List[T.Text]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('-k', dest='filter', default='', help='only run names containing this')
+    parser.add_argument('--quick', action='store_true', help='short runs, no 10k pattern sets')
+    parser.add_argument('--save', metavar='JSON', help='store the results as a baseline')
+    parser.add_argument('--compare', metavar='JSON', help='compare against a baseline')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown that counts as a regression (default 0.1)')
+    args = parser.parse_args(argv)
+    names = [n for n in BENCHMARKS if args.filter in n
+             and not (args.quick and '/10000/' in n)]
+    current = run(names, min_time=0.05 if args.quick else 0.3)
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump(current, fh, indent=2)
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        return 1 if compare(current, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,49 @@
 """Implement object pattern matching for python."""
+import sys
+import importlib
 
-from .core import (ObjectPattern, ObjectPatternMatch, ObjectMultiPattern,
+from .core import (ObjectPattern, ObjectPatternMatch, ObjectMultiPattern, AsyncObjectMultiPattern,
                    NoMatchingPatternError, AmbiguityError)
-from .casematch import SwitchBlock
+from .network import PatternNetwork
+from .predicates import Predicate, IsInstance, Eq, In, Range, Regex, Len, All, Any, Quantified
+from .cache import MatchCache
+from .profiling import MatchProfiler
+from .adaptive import AdaptiveOrder
+from .bindings import LazyBindings
+
+# imported on first use: not needed by most programs, some are slow to import
+_LAZY = {
+    'PatternRegistry': 'registry',
+    'ParallelMatcher': 'parallel',
+    'parallel_match': 'parallel',
+    'CompileCache': 'diskcache',
+    'ColumnarMatcher': 'columnar',
+    'match_columns': 'columnar',
+    'SwitchBlock': 'casematch',
+    'Overload': 'overloading',
+    'overload': 'overloading',
+}
+
+__all__ = ['ObjectPattern', 'ObjectPatternMatch', 'ObjectMultiPattern', 'AsyncObjectMultiPattern',
+           'NoMatchingPatternError', 'AmbiguityError', 'PatternNetwork', 'Predicate',
+           'IsInstance', 'Eq', 'In', 'Range', 'Regex', 'Len', 'All', 'Any', 'Quantified',
+           'MatchCache', 'MatchProfiler', 'AdaptiveOrder', 'LazyBindings', *_LAZY]
+
+
+def _load(name: str) -> object:
+    value = getattr(importlib.import_module(f'.{_LAZY[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name: str) -> object:
+        if name in _LAZY:
+            return _load(name)
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    def __dir__():
+        return sorted({*globals(), *_LAZY})
+else:  # no module __getattr__ (PEP 562)
+    for _name in _LAZY:
+        _load(_name)
@@ -0,0 +1,137 @@
+"""Adaptive fail-fast ordering of the tests of a pattern.
+
+Keys are resolved in insertion order, so an expensive test written early runs
+even when a cheap test of a later key would have rejected the object. An
+AdaptiveOrder profiles a pattern and, every interval matches, reorders its path
+trie so the tests with the lowest cost per rejection run first (the classic
+ordering of independent filters by ``cost / rejection rate``):
+
+- sibling paths are ordered by the time spent in their whole subtree per
+  rejection caused by it, so paths are still resolved after their prefixes,
+- the tests of a key and the keys ending at the same path are ordered the same way.
+
+Tests are assumed to be pure: a reordered pattern matches the same objects, only
+the warnings of tests that raise may differ. Bindings are unaffected, they are
+always computed in key order. ``freeze`` stops learning, detaches the profiler
+(no overhead anymore) and keeps the learned order, compiled matchers are
+regenerated with it.
+"""
+import typing as T
+
+from .paths import PathNode
+from .profiling import MatchProfiler, _label
+
+
+def _rank(time: float, rejections: float) -> float:
+    return time / rejections if rejections else float('inf')
+
+
+class AdaptiveOrder(MatchProfiler):
+    """Learn a fail-fast evaluation order for pattern (attaches itself as its profiler)."""
+
+    def __init__(self, pattern: T.Any, interval: int = 1000,
+                 callback: T.Optional[T.Callable[[dict], T.Any]] = None,
+                 label: T.Callable[[T.Any], T.Text] = _label):
+        if interval < 1:
+            raise ValueError(f'interval must be positive, got {interval!r}')
+        super().__init__(callback, label)
+        self.pattern, self.interval = pattern, interval
+        self.frozen, self.reorders, self._since = False, 0, 0
+        pattern.profiler = self
+
+    def __repr__(self) -> T.Text:
+        state = 'frozen' if self.frozen else f'{self._since}/{self.interval}'
+        return f'<AdaptiveOrder {state} reorders={self.reorders}/>'
+
+    def reset(self) -> None:
+        super().reset()
+        self._new_window()
+
+    def _new_window(self) -> None:
+        """Forget the path and test counters (the order they were measured with changed)."""
+        # pylint: disable=attribute-defined-outside-init
+        self.paths, self.tests = {}, {}
+        self._nodes: T.Dict[PathNode, T.List[float]] = {}
+        self._tests: T.Dict[T.Tuple[PathNode, int], T.List[float]] = {}
+
+    def _path_stats(self, node: PathNode) -> T.List[float]:
+        stats = self._nodes.get(node)
+        if stats is None:
+            stats = self._nodes[node] = self.paths.setdefault(node.source, [0, 0, 0.0])
+        return stats
+
+    def _test_stats(self, node: PathNode, test: T.Any, name: T.Text) -> T.List[float]:
+        key = node, id(test)
+        stats = self._tests.get(key)
+        if stats is None:
+            stats = self._tests[key] = [0, 0, 0, 0.0]
+            self.tests.setdefault(name, stats)
+        return stats
+
+    def _finish(self, pattern: T.Any, start: float, rule: T.Optional[T.Text]) -> None:
+        super()._finish(pattern, start, rule)
+        if self.frozen or pattern is not self.pattern:
+            return
+        self._since += 1
+        if self._since >= self.interval:
+            self.reorder()
+
+    def _order_node(self, node: PathNode) -> T.Tuple[float, float]:
+        """Reorder the subtree of node, return its (time, rejections)."""
+        stats = self._nodes.get(node)
+        time, rejections = (stats[2], stats[1]) if stats is not None else (0.0, 0)
+        keys = []
+        for index, tests in node.keys:
+            ranked, key_time, key_rejections = [], 0.0, 0
+            for t in tests:
+                _, rejected, errors, spent = self._tests.get((node, id(t)), (0, 0, 0, 0.0))
+                ranked.append((_rank(spent, rejected + errors), t))
+                key_time, key_rejections = key_time + spent, key_rejections + rejected + errors
+            ranked.sort(key=lambda r: r[0])
+            keys.append((_rank(key_time, key_rejections), (index, tuple(t for _, t in ranked))))
+            time, rejections = time + key_time, rejections + key_rejections
+        keys.sort(key=lambda r: r[0])
+        node.keys[:] = [k for _, k in keys]
+        children = []
+        for c in node.children:
+            c_time, c_rejections = self._order_node(c)
+            children.append((_rank(c_time, c_rejections), c))
+            time, rejections = time + c_time, rejections + c_rejections
+        children.sort(key=lambda r: r[0])
+        node.children[:] = [c for _, c in children]
+        return time, rejections
+
+    def reorder(self) -> None:
+        """Reorder the trie of the pattern with the path and test counters, then reset them."""
+        roots = self.pattern.compiled_pattern
+        ranked = [(_rank(*self._order_node(r)), r) for r in roots]
+        ranked.sort(key=lambda r: r[0])
+        roots[:] = [r for _, r in ranked]
+        for attr in ('_compiled_match', '_compiled_bindings'):  # regenerate with the new order
+            self.pattern.__dict__.pop(attr, None)
+        self.reorders += 1
+        self._since = 0
+        self._new_window()
+
+    def freeze(self) -> None:
+        """Stop learning: apply the pending data, detach from the pattern, keep the order."""
+        if self._since:
+            self.reorder()
+        self.frozen = True
+        if self.pattern.profiler is self:
+            self.pattern.profiler = None
+
+    def key_order(self) -> T.List[T.Any]:
+        """The keys of the pattern in the learned evaluation order.
+
+        Useful to persist the order: ``{k: d[k] for k in key_order()}``. Note that
+        reordering the dict itself also changes which key wins for names bound twice.
+        """
+        keys = list(self.pattern.pattern)
+        stack = list(reversed(self.pattern.compiled_pattern))
+        order = []
+        while stack:
+            node = stack.pop()
+            order.extend(keys[index] for index, _ in node.keys)
+            stack.extend(reversed(node.children))
+        return order
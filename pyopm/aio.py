@@ -0,0 +1,168 @@
+"""Match patterns whose tests and binds are coroutines (asyncio).
+
+The paths are resolved and the synchronous tests run like in ``match``; tests
+returning an awaitable are collected and awaited concurrently once the whole
+trie has been walked (at most limit at a time, if given). The first test that
+fails or raises decides: the remaining ones are cancelled. Note that the
+children of a path are resolved before its asynchronous tests have finished.
+
+The bindings of an async match are computed eagerly, awaitable bind results are
+awaited concurrently as well.
+"""
+import asyncio
+import inspect
+import typing as T
+from warnings import warn
+
+from .paths import STEP_ROOT, STEP_GET, STEP_EVAL
+
+
+async def _limited(aw: T.Awaitable, semaphore: T.Optional[asyncio.Semaphore]) -> T.Any:
+    """Await aw, holding semaphore (if any); close it if it never got to run."""
+    try:
+        if semaphore is None:
+            return await aw
+        async with semaphore:
+            return await aw
+    finally:
+        if inspect.iscoroutine(aw) and inspect.getcoroutinestate(aw) == inspect.CORO_CREATED:
+            aw.close()
+
+
+async def cancel_all(tasks: T.Iterable['asyncio.Future']) -> None:
+    """Cancel the tasks and wait until they are done."""
+    tasks = [t for t in tasks if not t.done()]
+    for t in tasks:
+        t.cancel()
+    if tasks:
+        await asyncio.wait(tasks)
+
+
+def _semaphore(limit: T.Optional[T.Union[int, asyncio.Semaphore]]
+               ) -> T.Optional[asyncio.Semaphore]:
+    return asyncio.Semaphore(limit) if isinstance(limit, int) else limit
+
+
+async def _all_true(checks: T.List[T.Tuple[T.Awaitable, T.Any, T.Any, T.Any]],
+                    semaphore: T.Optional[asyncio.Semaphore], verbose: bool) -> bool:
+    """Await the (awaitable, test, path, value) checks concurrently, stop at the first failure."""
+    tasks = {asyncio.ensure_future(_limited(aw, semaphore)): (test, path, o)
+             for aw, test, path, o in checks}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                test, path, o = tasks[task]
+                exc = task.exception()
+                if exc is not None:
+                    warn(f'Error running {test!r} ({path!r}: {o!r}): {exc}')
+                    return False
+                if not task.result():
+                    if verbose:
+                        warn(f'Test failed: {test!r} ({path!r}: {o!r})')
+                    return False
+        return True
+    finally:
+        await cancel_all(pending)
+
+
+async def amatch(pattern: T.Any, obj: object, eval_globals: dict = None, eval_locals: dict = None,
+                 limit: T.Optional[T.Union[int, asyncio.Semaphore]] = None) -> T.Any:
+    """Apply pattern to obj, awaiting asynchronous tests and binds (see ObjectPattern.amatch)."""
+    # pylint: disable=too-many-locals,too-many-branches
+    verbose = pattern.verbose
+    extra_locals = eval_locals if isinstance(eval_locals, dict) else {}
+    root = extra_locals.get('obj', obj)
+    eval_locals = None
+    values = [None] * len(pattern.pattern)
+    checks = []
+
+    stack = [(node, None) for node in reversed(pattern.compiled_pattern)]
+    while stack:
+        node, o = stack.pop()
+        kind = node.kind
+        try:
+            if kind == STEP_GET:
+                o = node.accessor(o)
+            elif kind == STEP_ROOT:
+                o = root
+            elif kind == STEP_EVAL:
+                if eval_locals is None:
+                    eval_locals = {'obj': obj, **extra_locals}
+                o = eval(node.accessor, eval_globals, eval_locals)
+            else:
+                raise node.accessor
+        except Exception as e:
+            if verbose:
+                warn(f'Missing attribute? {node.source!r}, {e}')
+            break
+        failed = False
+        for index, tests in node.keys:
+            for test_func in tests:
+                try:
+                    result = test_func(o)
+                    if inspect.isawaitable(result):
+                        checks.append((result, test_func, node.path, o))
+                    elif not bool(result):
+                        if verbose:
+                            warn(f'Test failed: {test_func!r} ({node.path!r}: {o!r})')
+                        failed = True
+                except Exception as e:
+                    warn(f'Error running {test_func!r} ({node.path!r}: {o!r}): {e}')
+                    failed = True
+                if failed:
+                    break
+            if failed:
+                break
+            values[index] = o
+        if failed:
+            break
+        if node.children:
+            stack.extend((c, o) for c in reversed(node.children))
+    else:
+        semaphore = _semaphore(limit)
+        if not checks or await _all_true(checks, semaphore, verbose):
+            bound = await _abind(pattern, obj, values, eval_globals, extra_locals, eval_locals,
+                                 semaphore)
+            return pattern.match_type(obj, pattern, bound, pattern.config)
+        return None
+    for aw, *_ in checks:  # decided before anything was awaited
+        if inspect.iscoroutine(aw):
+            aw.close()
+    return None
+
+
+async def _abind(pattern: T.Any, obj: object, values: T.Sequence[T.Any],
+                 eval_globals: T.Optional[dict], extra_locals: dict,
+                 eval_locals: T.Optional[dict], semaphore: T.Optional[asyncio.Semaphore]
+                 ) -> dict:
+    """Compute the bindings in key order, awaiting the awaitable ones concurrently."""
+    # pylint: disable=protected-access,too-many-arguments
+    items, awaited = [], []
+    for index, binds in pattern._bind_plan:
+        o = values[index]
+        for var_name, var_eval in binds:
+            if pattern.verbose and any(var_name == n for n, _ in items):
+                warn(f'Overwriting binding for {var_name!r}')
+            if callable(var_eval):
+                value = var_eval(o)
+                if inspect.isawaitable(value):
+                    awaited.append((len(items), value))
+            elif isinstance(var_eval, str):
+                if eval_locals is None:
+                    eval_locals = {'obj': obj, **extra_locals}
+                value = eval(pattern._compiled_binds[var_eval], eval_globals,
+                             {**eval_locals, 'o': o})
+            else:
+                value = o
+            items.append((var_name, value))
+    if awaited:
+        tasks = [asyncio.ensure_future(_limited(aw, semaphore)) for _, aw in awaited]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            await cancel_all(tasks)
+        for (i, _), value in zip(awaited, results):
+            items[i] = items[i][0], value
+    return dict(items)
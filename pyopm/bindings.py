@@ -0,0 +1,118 @@
+"""Containers for the values bound by a match."""
+import keyword
+import typing as T
+from collections.abc import MutableMapping
+
+
+class PendingBinding:
+    """A binding that has not been computed yet: (key index, bind expression)."""
+    __slots__ = ('index', 'expr')
+
+    def __init__(self, index: int, expr: T.Any):
+        self.index, self.expr = index, expr
+
+
+class LazyBindings(MutableMapping):
+    """The bindings of a match, each one is computed when it is first accessed.
+
+    The match keeps the resolved values of the pattern keys; bind callables and
+    expressions only run for the names that are actually used (``bound[name]``,
+    attribute access on the match or entering its with block).
+    """
+    __slots__ = ('_items', '_pattern', '_obj', '_values', '_eval_globals', '_extra_locals')
+
+    def __init__(self, pattern: T.Any, obj: object, values: T.Sequence[T.Any],
+                 eval_globals: T.Optional[dict] = None, extra_locals: T.Optional[dict] = None):
+        self._items = dict(pattern._bind_template)  # pylint: disable=protected-access
+        self._pattern, self._obj, self._values = pattern, obj, values
+        self._eval_globals, self._extra_locals = eval_globals, extra_locals
+
+    def __getitem__(self, name: T.Text) -> T.Any:
+        value = self._items[name]
+        if value.__class__ is PendingBinding:
+            o, expr = self._values[value.index], value.expr
+            if callable(expr):
+                value = expr(o)
+            elif isinstance(expr, str):
+                code = self._pattern._compiled_binds[expr]  # pylint: disable=protected-access
+                value = eval(code, self._eval_globals,
+                             {'obj': self._obj, **(self._extra_locals or {}), 'o': o})
+            else:
+                value = o
+            self._items[name] = value
+        return value
+
+    def __setitem__(self, name: T.Text, value: T.Any) -> None:
+        self._items[name] = value
+
+    def __delitem__(self, name: T.Text) -> None:
+        del self._items[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._items
+
+    def __iter__(self) -> T.Iterator[T.Text]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __repr__(self) -> T.Text:
+        return repr(dict(self))
+
+    @property
+    def pending(self) -> T.Tuple[T.Text, ...]:
+        """The names whose values have not been computed yet."""
+        return tuple(k for k, v in self._items.items() if v.__class__ is PendingBinding)
+
+
+_record_types: T.Dict[T.Tuple[T.Text, ...], type] = {}
+
+
+def record_type(names: T.Iterable[T.Text]) -> type:
+    """The ``__slots__`` based record class for a tuple of binding names (cached).
+
+    Records support attribute access and tuple unpacking (in the order of names).
+    """
+    names = tuple(names)
+    try:
+        return _record_types[names]
+    except KeyError:
+        pass
+    for name in names:
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(f'Binding name {name!r} is not a valid identifier')
+    args = ''.join(f', {n}' for n in names)
+    body = ''.join(f'    self.{n} = {n}\n' for n in names) or '    pass\n'
+    values = ''.join(f'self.{n}, ' for n in names)
+    src = (f'def __init__(self{args}):\n{body}'
+           f'def __iter__(self):\n    return iter(({values}))\n')
+    namespace: T.Dict[T.Text, T.Any] = {}
+    exec(src, {}, namespace)  # pylint: disable=exec-used
+    cls = type('Bindings', (_RecordBase,), {'__slots__': names, '_fields': names,
+                                            '__init__': namespace['__init__'],
+                                            '__iter__': namespace['__iter__']})
+    _record_types[names] = cls
+    return cls
+
+
+class _RecordBase:
+    """Common methods of the record types."""
+    __slots__ = ()
+    _fields: T.Tuple[T.Text, ...] = ()
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> T.Text:
+        fields = ', '.join(f'{n}={v!r}' for n, v in self._asdict().items())
+        return f'{type(self).__name__}({fields})'
+
+    def _asdict(self) -> T.Dict[T.Text, T.Any]:
+        return dict(zip(self._fields, self))
@@ -0,0 +1,108 @@
+"""Bounded LRU memoization of match results.
+
+Only worth it for objects that are hashable *and* immutable (frozen configs,
+tuples, ...): results are looked up by a key of the object, so a mutated object
+would be served a stale result. Use ``invalidate`` or ``clear`` when objects can
+change. The default key (see default_key) only covers immutable values and
+only treats them as the same if no pattern can tell them apart, ``(1, 2)`` and
+``(1.0, 2)`` are different keys; other objects, like plain (mutable) instances
+or instances with a custom ``__eq__``, need a key function. Objects without a
+key (and unhashable ones) are never cached, they are simply matched.
+
+The bound values are shared by all the hits of a result (every match gets its
+own dict of them): do not mutate them, or do not cache patterns binding mutable
+objects.
+"""
+import collections
+import typing as T
+
+_MISSING = object()
+_EXACT = (type(None), bool, int, str, bytes)  # equal values of these types are identical
+
+
+def default_key(obj: object) -> T.Hashable:
+    """A key that is only equal for objects that no pattern can tell apart.
+
+    Scalars and strings are keyed with their exact type (floats by their bits:
+    0.0 and -0.0 differ), tuples (and namedtuples) and frozensets by the keys of
+    their elements and frozen dataclasses by the keys of their fields. Raises
+    TypeError for anything else, also for objects that compare by identity: they
+    may be mutated between two matches.
+    """
+    cls = type(obj)
+    if cls in _EXACT:
+        return cls, obj
+    if cls is float:
+        return cls, obj.hex()
+    if cls is complex:
+        return cls, obj.real.hex(), obj.imag.hex()
+    if issubclass(cls, tuple) and cls.__eq__ is tuple.__eq__:
+        return cls, tuple(map(default_key, obj))
+    if cls is frozenset:
+        return cls, frozenset(map(default_key, obj))
+    params = cls.__dict__.get('__dataclass_params__')
+    if params is not None and params.frozen and params.eq:
+        import dataclasses  # pylint: disable=import-outside-toplevel  # only for dataclasses
+        return cls, tuple(default_key(getattr(obj, f.name)) for f in dataclasses.fields(obj))
+    raise TypeError(f'no default cache key for {cls.__qualname__} objects, pass key=')
+
+
+class MatchCache:
+    """An LRU cache for match results, shareable between patterns."""
+
+    def __init__(self, maxsize: int = 1024,
+                 key: T.Optional[T.Callable[[object], T.Hashable]] = None):
+        if maxsize < 1:
+            raise ValueError(f'maxsize must be positive, got {maxsize!r}')
+        self.maxsize, self.key = maxsize, key
+        self._data: 'collections.OrderedDict[T.Tuple[T.Any, T.Any], T.Any]' = \
+            collections.OrderedDict()
+        self.hits = self.misses = self.skipped = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> T.Text:
+        return f'<MatchCache {self.stats()!r}/>'
+
+    def stats(self) -> T.Dict[T.Text, int]:
+        """Hit/miss statistics (skipped: objects without a (hashable) key, not cached)."""
+        return {'hits': self.hits, 'misses': self.misses, 'skipped': self.skipped,
+                'evictions': self.evictions, 'size': len(self._data), 'maxsize': self.maxsize}
+
+    def _key(self, obj: object) -> T.Any:
+        return self.key(obj) if self.key is not None else default_key(obj)
+
+    def lookup(self, scope: T.Hashable, obj: object, compute: T.Callable[[], T.Any]) -> T.Any:
+        """Return the cached result for (scope, obj) or compute and cache it."""
+        try:
+            full_key = scope, self._key(obj)
+            value = self._data.get(full_key, _MISSING)
+        except TypeError:  # unhashable or no default key
+            self.skipped += 1
+            return compute()
+        if value is not _MISSING:
+            self.hits += 1
+            self._data.move_to_end(full_key)
+            return value
+        self.misses += 1
+        value = self._data[full_key] = compute()
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def invalidate(self, obj: object) -> int:
+        """Forget all the results for obj (for all scopes), return how many were dropped."""
+        try:
+            key = self._key(obj)
+            stale = [k for k in self._data if k[1] == key]
+        except TypeError:
+            return 0
+        for k in stale:
+            del self._data[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Forget all the results (the statistics are kept)."""
+        self._data.clear()
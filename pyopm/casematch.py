@@ -9,9 +9,72 @@ cproperty = (functools.cached_property if hasattr(functools, 'cached_property')
              else property)
 
 
+def root_type_guards(pattern: ObjectPattern) -> T.Tuple[T.Tuple[type, ...], ...]:
+    """The type tuples of all isinstance tests on ``obj`` itself."""
+    tests = pattern.pattern.get('obj', {}).get('eval', ())
+    return tuple(t.types for t in tests if isinstance(getattr(t, 'types', None), tuple))
+
+
 class SwitchBlock:
-    def __init__(self, *cases: T.Iterable[T.Tuple[ObjectPattern, T.Callable]]):
+    """Call the function of the first case whose pattern matches an object.
+
+    The functions are called with the bindings of the match as keyword arguments.
+    Cases whose pattern tests ``obj`` with an isinstance predicate are indexed by
+    type: for every concrete type only the cases that can possibly match are tried.
+    """
+
+    def __init__(self, *cases: T.Iterable[T.Tuple[ObjectPattern, T.Callable]],
+                 default: T.Optional[T.Callable] = None):
         self.cases = list(cases)
+        self.default = default
+        self._dispatch_cache: T.Dict[type, T.Tuple[T.Tuple[ObjectPattern, T.Callable], ...]] = {}
+
+    def add(self, pattern: ObjectPattern, func: T.Callable) -> None:
+        """Add a case (and invalidate the type index)."""
+        self.cases.append((pattern, func))
+        self.clear_cache()
+
+    def clear_cache(self) -> None:
+        """Forget the cached candidates, e.g. after registering classes with an ABC."""
+        self._dispatch_cache.clear()
+
+    def candidates(self, cls: type) -> T.Tuple[T.Tuple[ObjectPattern, T.Callable], ...]:
+        """The cases that can match instances of cls, in order."""
+        try:
+            return self._dispatch_cache[cls]
+        except KeyError:
+            pass
+        result = self._dispatch_cache[cls] = tuple(
+            (p, f) for p, f in self.cases
+            if all(issubclass(cls, types) for types in root_type_guards(p)))
+        return result
+
+    def _dispatch(self, obj: object, candidates) -> T.Any:
+        for pattern, func in candidates:
+            m = pattern.match(obj)
+            if m is not None:
+                return func(**m.bound)
+        if self.default is not None:
+            return self.default(obj)
+        raise NoMatchingPatternError(f'{obj!r} did not match any pattern!')
+
+    def switch(self, obj: object) -> T.Any:
+        """Call the function of the first matching case and return its result."""
+        cls = type(obj)
+        if cls is not obj.__class__:  # proxies etc: isinstance != issubclass(type(obj))
+            return self._dispatch(obj, self.cases)
+        return self._dispatch(obj, self.candidates(cls))
 
-    def switch(self, obj: object):
-        ...
+    def switch_many(self, objects: T.Iterable[object]) -> T.Iterator[T.Any]:
+        """Lazily switch every object of an iterable, yielding the results."""
+        cache, candidates, dispatch, cases = (self._dispatch_cache, self.candidates,
+                                              self._dispatch, self.cases)
+        for obj in objects:
+            cls = type(obj)
+            if cls is not obj.__class__:
+                yield dispatch(obj, cases)
+                continue
+            cands = cache.get(cls)
+            if cands is None:
+                cands = candidates(cls)
+            yield dispatch(obj, cands)
@@ -0,0 +1,137 @@
+"""Generate specialized, straight-line matcher functions for ObjectPatterns.
+
+Like dataclasses and attrs generate ``__init__``, the matcher is created from
+Python source: the path trie is unrolled into one function, accessors,
+predicates and bind callables are bound as closure constants and all the
+resolutions and tests share a single try block. Whenever a warning would be
+emitted (tests raising, verbose patterns), the generated function defers to
+the interpreting ``match`` method, so the results are exactly the same.
+"""
+import itertools
+import typing as T
+from warnings import warn
+
+from .paths import STEP_ROOT, STEP_GET, STEP_EVAL
+from .bindings import LazyBindings
+from .diskcache import compile_cached, digest
+
+
+def _root(obj: object, eval_locals: T.Any) -> object:
+    return eval_locals.get('obj', obj) if isinstance(eval_locals, dict) else obj
+
+
+def _env(obj: object, eval_locals: T.Any) -> dict:
+    return {'obj': obj, **eval_locals} if isinstance(eval_locals, dict) else {'obj': obj}
+
+
+def _bindings_of(match: T.Callable[..., T.Any]) -> T.Callable[..., T.Optional[dict]]:
+    def bindings(obj, eval_globals=None, eval_locals=None):
+        m = match(obj, eval_globals, eval_locals)
+        return None if m is None else m.bound
+    return bindings
+
+
+def generate_matcher_source(pattern: T.Any, bindings_only: bool = False
+                            ) -> T.Tuple[T.Text, T.Dict[T.Text, T.Any]]:
+    """Generate the source of the matcher function and the constants it needs.
+
+    With bindings_only, the function returns the dict of bindings instead of a match.
+    """
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    slow = _bindings_of(pattern.match) if bindings_only else pattern.match
+    consts: T.Dict[T.Text, T.Any] = {'_root': _root, '_env': _env, '_warn': warn,
+                                     '_pattern': pattern, '_slow': slow}
+
+    def const(prefix: T.Text, value: T.Any) -> T.Text:
+        name = f'{prefix}{len(consts)}'
+        consts[name] = value
+        return name
+
+    fail = 'return _slow(obj, eval_globals, eval_locals)' if pattern.verbose else 'return None'
+    bind_plan = pattern._bind_plan  # pylint: disable=protected-access
+    needs_env = (any(n.kind == STEP_EVAL for r in pattern.compiled_pattern for n in r.walk())
+                 or bindings_only and any(isinstance(e, str) for _, b in bind_plan for _, e in b))
+    lines = ['def match(obj, eval_globals=None, eval_locals=None):']
+    if needs_env:
+        lines.append('    env = _env(obj, eval_locals)')
+    lines += ['    _s = 0', '    try:']
+    key_vars: T.Dict[int, T.Text] = {}
+    slots = itertools.count()
+
+    def emit(node, parent_var: T.Optional[T.Text]) -> None:
+        var = f'v{next(slots)}'
+        if node.kind == STEP_ROOT:
+            lines.append(f'        {var} = obj if eval_locals is None else _root(obj, eval_locals)')
+        elif node.kind == STEP_GET:
+            lines.append(f'        {var} = {const("g", node.accessor)}({parent_var})'
+                         f'  # {node.source!r}')
+        elif node.kind == STEP_EVAL:
+            lines.append(f'        {var} = eval({const("c", node.accessor)}, eval_globals, env)'
+                         f'  # {node.source!r}')
+        else:
+            lines.append(f'        raise {const("e", node.accessor)}  # {node.source!r}')
+            return
+        tests = [t for _, ts in node.keys for t in ts]
+        if tests:
+            lines.append('        _s = 1')
+            for t in tests:
+                lines.append(f'        if not {const("t", t)}({var}):')
+                lines.append(f'            {fail}')
+            lines.append('        _s = 0')
+        for index, _ in node.keys:
+            key_vars[index] = var
+        for c in node.children:
+            emit(c, var)
+
+    for root in pattern.compiled_pattern:
+        emit(root, None)
+    if lines[-1] == '    try:':
+        lines.append('        pass')
+    lines.append('    except Exception:')
+    lines.append('        if _s:  # a test raised: let match() emit the warning')
+    lines.append('            return _slow(obj, eval_globals, eval_locals)')
+    lines.append(f'        {fail}')
+    if pattern.verbose:
+        for var_name in pattern._overwritten_bindings:  # pylint: disable=protected-access
+            lines.append(f'    _warn({f"Overwriting binding for {var_name!r}"!r})')
+    if not bindings_only:  # the bindings are computed lazily from the key values
+        consts['_Match'], consts['_Lazy'] = type(pattern).match_type, LazyBindings
+        values = ''.join(f'{key_vars.get(i, "None")}, ' for i in range(len(pattern.pattern)))
+        lines.append(f'    bound = _Lazy(_pattern, obj, ({values.rstrip()}), eval_globals,'
+                     ' eval_locals if isinstance(eval_locals, dict) else None)')
+        lines.append('    return _Match(obj, _pattern, bound, _pattern.config)')
+        return '\n'.join(lines) + '\n', consts
+    lines.append('    bound = {}')
+    for index, binds in bind_plan:
+        var = key_vars.get(index, 'None')  # None: unreachable, resolving the key raises
+        for var_name, var_eval in binds:
+            if callable(var_eval):
+                value = f'{const("b", var_eval)}({var})'
+            elif isinstance(var_eval, str):
+                code = pattern._compiled_binds[var_eval]  # pylint: disable=protected-access
+                value = f"eval({const('c', code)}, eval_globals, {{**env, 'o': {var}}})"
+            else:
+                value = var
+            lines.append(f'    bound[{var_name!r}] = {value}')
+    lines.append('    return bound')
+    return '\n'.join(lines) + '\n', consts
+
+
+def build_matcher(pattern: T.Any, bindings_only: bool = False) -> T.Callable[..., T.Any]:
+    """Generate, exec and return the matcher function for an ObjectPattern."""
+    source, consts = generate_matcher_source(pattern, bindings_only)
+    # closure constants: wrap the function in a factory taking them as arguments
+    names = ', '.join(consts)
+    factory_src = (f'def __create_fn__({names}):\n'
+                   + ''.join(f'    {line}\n' for line in source.splitlines())
+                   + '    return match\n')
+    # named after the source: identical matchers share their (cacheable) code
+    filename = f'<pyopm compiled matcher {digest(factory_src)[:16]}>'
+    namespace: T.Dict[T.Text, T.Any] = {}
+    exec(compile_cached(factory_src, filename, 'exec'), {}, namespace)  # pylint: disable=exec-used
+    import linecache  # pylint: disable=import-outside-toplevel
+    linecache.cache[filename] = (len(factory_src), None, factory_src.splitlines(True), filename)
+    fn = namespace['__create_fn__'](**consts)
+    fn.__qualname__ = f'{type(pattern).__qualname__}.compile.<locals>.match'
+    fn.__doc__ = pattern.match.__doc__
+    return fn
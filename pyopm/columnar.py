@@ -0,0 +1,277 @@
+"""Vectorized matching of columnar data: NumPy structured arrays or dicts of arrays.
+
+Every row of the data is one object: ``obj.price`` and ``obj['price']`` select
+the column ``price`` (``obj.pos.x`` a column of a nested structured array or
+dict). The declarative predicates (Eq, In, Range, IsInstance, Len, All and Any)
+of such keys compile into boolean masks over the whole column::
+
+    m = ObjectPattern({'obj.price': {'eval': [Range(0, 100)], 'bind': {'price': None}},
+                       'obj.kind': {'eval': [In({'book', 'dvd'})]}}).match_columns(table)
+    m.mask   # which rows matched
+    m.bound  # {'price': table['price'][m.mask]}
+
+Opaque callables, predicates that do not fit the column (like Range over a
+string column) and keys that are no plain column paths (calls, ``[*]``, ``obj``
+itself...) fall back to matching row by row, after the masks, on the rows that
+are left. The row objects support ``row.name`` and ``row['name']``.
+
+Binds of column keys receive the column slice of the matching rows (None binds
+it as is), the bindings of the row by row keys are lists with one value per
+matching row. If a column is missing, no row matches.
+
+NumPy is an optional dependency, it is only needed to use this module.
+"""
+import functools
+import typing as T
+from collections.abc import Mapping
+from warnings import warn
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .core import ObjectPattern
+from .paths import parse_path, SEG_ROOT, SEG_ATTR, SEG_ITEM
+from .predicates import Eq, In, Range, IsInstance, Len, All, Any, order_tests
+
+
+class ColumnarMatch(T.NamedTuple):
+    """The rows of a batch that matched a pattern and their bindings."""
+    mask: T.Any  # boolean array, one entry per row
+    bound: T.Dict[T.Text, T.Any]
+
+    @property
+    def rows(self) -> T.Any:
+        """The indices of the matching rows."""
+        return np.flatnonzero(self.mask)
+
+
+def column_path(key: T.Text) -> T.Optional[T.Tuple[T.Text, ...]]:
+    """The column names a key selects (``obj.a['b']`` -> ('a', 'b')), None if it is no column."""
+    segments = parse_path(key)
+    if len(segments) < 2 or segments[0].kind != SEG_ROOT or segments[0].value != 'obj':
+        return None
+    names = []
+    for seg in segments[1:]:
+        if not (seg.kind == SEG_ATTR or (seg.kind == SEG_ITEM and isinstance(seg.value, str))):
+            return None
+        names.append(seg.value)
+    return tuple(names)
+
+
+def _is_table(data: T.Any) -> bool:
+    return isinstance(data, Mapping) or bool(getattr(getattr(data, 'dtype', None), 'names', None))
+
+
+def n_rows(data: T.Any) -> int:
+    """The number of rows of a structured array or (nested) mapping of arrays."""
+    while isinstance(data, Mapping):
+        if not data:
+            return 0
+        data = next(iter(data.values()))
+    return len(data)
+
+
+def _column(data: T.Any, names: T.Tuple[T.Text, ...]) -> T.Any:
+    for name in names:
+        data = data[name]
+    return data if isinstance(data, Mapping) else np.asarray(data)
+
+
+def _cell(column: T.Any, index: int) -> T.Any:
+    return Row(column, index) if _is_table(column) else column[index]
+
+
+def _take(column: T.Any, mask: T.Any) -> T.Any:
+    if isinstance(column, Mapping):
+        return {k: _take(v, mask) for k, v in column.items()}
+    return np.asarray(column)[mask]
+
+
+class Row:
+    """One row of columnar data, for the tests that run row by row."""
+    __slots__ = ('_data', '_index')
+
+    def __init__(self, data: T.Any, index: int):
+        self._data, self._index = data, index
+
+    def __repr__(self) -> T.Text:
+        return f'<Row {self._index}/>'
+
+    def __getitem__(self, name: T.Text) -> T.Any:
+        try:
+            column = self._data[name]
+        except (ValueError, IndexError, TypeError) as e:  # structured arrays
+            raise KeyError(name) from e
+        return _cell(column, self._index)
+
+    def __getattr__(self, name: T.Text) -> T.Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def _scalars(*values: T.Any) -> bool:
+    """Whether the values compare element-wise (sequences would be broadcast)."""
+    return all(np.ndim(v) == 0 for v in values)
+
+
+def _eq(test: Eq, column: T.Any) -> T.Any:
+    return column == test.value if _scalars(test.value) else None
+
+
+def _in(test: In, column: T.Any) -> T.Any:
+    return np.isin(column, list(test.values)) if _scalars(*test.values) else None
+
+
+def _range(test: Range, column: T.Any) -> T.Any:
+    if not _scalars(test.low, test.high):
+        return None
+    mask = np.ones(len(column), dtype=bool)
+    if test.low is not None:
+        mask &= column >= test.low
+    if test.high is not None:
+        mask &= column < test.high
+    return mask
+
+
+def _isinstance(test: IsInstance, column: T.Any) -> T.Any:
+    if column.dtype.kind == 'O':  # depends on every value
+        return None
+    return np.full(len(column), issubclass(column.dtype.type, test.types))
+
+
+def _len(test: Len, column: T.Any) -> T.Any:
+    if column.dtype.kind not in 'US':
+        return None
+    lengths = np.char.str_len(column)
+    return predicate_mask(test.test, lengths) if callable(test.test) else lengths == test.test
+
+
+def _all(test: All, column: T.Any) -> T.Any:
+    masks = [predicate_mask(p, column) for p in test.predicates]
+    if any(m is None for m in masks):
+        return None
+    return functools.reduce(np.logical_and, masks, np.ones(len(column), dtype=bool))
+
+
+def _any(test: Any, column: T.Any) -> T.Any:
+    masks = [predicate_mask(p, column) for p in test.predicates]
+    if any(m is None for m in masks):
+        return None
+    return functools.reduce(np.logical_or, masks, np.zeros(len(column), dtype=bool))
+
+
+# predicate type -> function computing its mask over a column (None: row by row)
+MASKS: T.Dict[type, T.Callable[[T.Any, T.Any], T.Any]] = {
+    Eq: _eq, In: _in, Range: _range, IsInstance: _isinstance, Len: _len, All: _all, Any: _any,
+}
+
+
+def predicate_mask(test: T.Callable, column: T.Any) -> T.Any:
+    """The boolean mask of test over a column, None if it has to run row by row."""
+    compute = MASKS.get(type(test))
+    if compute is None or isinstance(column, Mapping) or column.ndim != 1:
+        return None
+    try:
+        mask = compute(test, column)
+    except (TypeError, ValueError):  # e.g. not comparable: the row by row test decides
+        return None
+    if mask is None:
+        return None
+    mask = np.asarray(mask)
+    return mask if mask.dtype == bool and mask.shape == column.shape else None
+
+
+def _passes(test: T.Callable, key: T.Text, o: T.Any) -> bool:
+    try:
+        return bool(test(o))
+    except Exception as e:  # pylint: disable=broad-except
+        warn(f'Error running {test!r} ({key!r}: {o!r}): {e}')
+        return False
+
+
+class ColumnarMatcher:
+    """Match an ObjectPattern against all the rows of columnar data at once."""
+
+    def __init__(self, pattern: ObjectPattern):
+        if np is None:
+            raise ImportError('columnar matching needs numpy')
+        self.pattern = pattern
+        self.columns: T.List[T.Tuple[T.Text, T.Tuple[T.Text, ...], T.Tuple[T.Callable, ...]]] = []
+        rowwise = {}
+        for key, spec in pattern.pattern.items():
+            names = None if 'quantifier' in spec else column_path(key)
+            if names is None:
+                rowwise[key] = spec
+            else:
+                self.columns.append((key, names, order_tests(spec.get('eval', ()))))
+        self.rowwise = (ObjectPattern(rowwise, pattern.verbose, pattern.config)
+                        if rowwise else None)
+
+    def __repr__(self) -> T.Text:
+        return (f'<ColumnarMatcher columns={len(self.columns)} '
+                f'rowwise={0 if self.rowwise is None else len(self.rowwise.pattern)}/>')
+
+    def match(self, data: T.Any, eval_globals: dict = None) -> ColumnarMatch:
+        """Match every row: the masks first, then the row by row tests on the rows left."""
+        # pylint: disable=too-many-locals
+        mask = np.ones(n_rows(data), dtype=bool)
+        columns, deferred = {}, []
+        for key, names, tests in self.columns:
+            try:
+                column = columns[key] = _column(data, names)
+            except (LookupError, ValueError, TypeError):  # missing column
+                if self.pattern.verbose:
+                    warn(f'Missing column? {key!r}')
+                return ColumnarMatch(np.zeros(len(mask), dtype=bool), {})
+            for test in tests:
+                m = predicate_mask(test, column)
+                if m is None:
+                    deferred.append((key, test, column))
+                else:
+                    mask &= m
+        for key, test, column in deferred:
+            for i in np.flatnonzero(mask):
+                mask[i] = _passes(test, key, _cell(column, i))
+        matches = {}
+        if self.rowwise is not None:
+            for i in np.flatnonzero(mask):
+                m = self.rowwise.match(Row(data, i), eval_globals)
+                if m is None:
+                    mask[i] = False
+                else:
+                    matches[i] = m.bound
+        return ColumnarMatch(mask, self._bind(data, mask, columns, matches, eval_globals))
+
+    def _bind(self, data: T.Any, mask: T.Any, columns: T.Dict[T.Text, T.Any],
+              matches: T.Dict[int, T.Any], eval_globals: T.Optional[dict]) -> dict:
+        # pylint: disable=too-many-arguments,protected-access
+        rows, bound = np.flatnonzero(mask), {}
+        for key, spec in self.pattern.pattern.items():
+            binds = spec.get('bind', {})
+            if not binds:
+                continue
+            if key not in columns:
+                for var_name in binds:
+                    bound[var_name] = [matches[i][var_name] for i in rows]
+                continue
+            o = _take(columns[key], mask)
+            for var_name, var_eval in binds.items():
+                if callable(var_eval):
+                    bound[var_name] = var_eval(o)
+                elif isinstance(var_eval, str):
+                    code = self.pattern._compiled_binds[var_eval]
+                    bound[var_name] = eval(code, eval_globals,  # pylint: disable=eval-used
+                                           {'obj': data, 'o': o})
+                else:
+                    bound[var_name] = o
+        return bound
+
+
+def match_columns(data: T.Any, *patterns: ObjectPattern,
+                  eval_globals: dict = None) -> T.List[ColumnarMatch]:
+    """Match every pattern against all the rows of data, one ColumnarMatch per pattern."""
+    return [p.match_columns(data, eval_globals) for p in patterns]
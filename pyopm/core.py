@@ -1,31 +1,68 @@
 """Implement basic Object Pattern Matching functionality."""
-import re
+# pylint: disable=import-outside-toplevel  # slow or rarely needed modules are imported on use
 import sys
 import functools
+import itertools
+import weakref
 import typing as T
 from types import CodeType, FrameType  # , CellType
 from warnings import warn
-import inspect
 
-from pprint import pformat
-from textwrap import indent
 
-if sys.implementation.name == 'cpython':
-    from ctypes import pythonapi, py_object, c_int
+from .paths import key_path, PathNode, build_path_trie, STEP_ROOT, STEP_GET, STEP_EVAL
+from .paths import (break_attr_path, compile_accessors,  # pylint: disable=unused-import
+                    STEP_ERROR)  # re-exported
+from .network import PatternNetwork, pattern_network
+from .predicates import order_tests
+from .codegen import build_matcher
+from .cache import MatchCache
+from .diskcache import compile_cached
+from .profiling import MatchProfiler
+from .adaptive import AdaptiveOrder
+from .bindings import LazyBindings, PendingBinding, record_type
+
+if T.TYPE_CHECKING:
+    import asyncio  # pylint: disable=unused-import
+
+# Binding backend, selected at import time: how writes to frame.f_locals reach the frame.
+if sys.version_info >= (3, 13):
+    # PEP 667: frame.f_locals is a write-through FrameLocalsProxy, no sync needed
+    BINDING_BACKEND = 'pep667'
+
+    def locals_to_fast(*_, **__):  # pylint: disable=missing-function-docstring
+        pass
+elif sys.implementation.name == 'cpython':
+    BINDING_BACKEND = 'ctypes'
 
     def locals_to_fast(frame, clear: int = 0, **_):  # pylint: disable=missing-function-docstring
+        from ctypes import pythonapi, py_object, c_int  # deferred: only with blocks need it
         pythonapi.PyFrame_LocalsToFast(py_object(frame), c_int(clear))
 elif sys.implementation.name == 'pypy':
     import __pypy__  # pylint: disable=import-error
+    BINDING_BACKEND = 'pypy'
 
     def locals_to_fast(frame, *_, **__):  # pylint: disable=missing-function-docstring
         __pypy__.locals_to_fast(frame)
 else:
+    BINDING_BACKEND = 'none'
 
     def locals_to_fast(*_, **__):  # pylint: disable=missing-function-docstring
         warn('LocalsToFast not defined (unhandled python implementation)')
 
-cproperty = getattr(functools, 'cached_property', property)
+try:
+    cproperty = functools.cached_property
+except AttributeError:  # python < 3.8: compiled patterns must not be rebuilt on every access
+    class cproperty:  # pylint: disable=invalid-name,too-few-public-methods
+        """Minimal functools.cached_property: store the value in the instance dict."""
+
+        def __init__(self, func: T.Callable):
+            self.func, self.__doc__ = func, func.__doc__
+
+        def __get__(self, instance: T.Any, owner: type = None) -> T.Any:
+            if instance is None:
+                return self
+            value = instance.__dict__[self.func.__name__] = self.func(instance)
+            return value
 
 CONFIG = {
     'changed existing': 'restore',  # restore (original value), keep (current value)
@@ -36,79 +73,70 @@ CONFIG = {
     'unchanged existing': 'restore',  # restore (original value), keep (bound value)
     # 'unchanged non-existing': 'delete',  # delete, keep (bound value)
     'unchanged non-existing': 'keep',  # 'delete' would be better, but it does not work atm
+    'change detection': 'equality',  # equality (!=), identity (is not: cheap for big objects)
 }
 
 
-def break_attr_path(path: T.Text) -> T.Tuple[T.Text, ...]:
-    """Stupid approach to split an expression into parts."""
-    parts, tmp = [], ''
-    for x in re.split(r'([\.\[])', path):  # TODO: match parens?
-        if x in {'.', '[', '('}:
-            tmp = x
-            continue
-        parts.append(tmp + x)
-    return tuple(parts)
+class CodeInfo(T.NamedTuple):
+    """How the names of a code object are accessed."""
+    fast: T.FrozenSet[str]  # arguments, locals
+    globals: T.FrozenSet[str]  # globals
+    closure: T.FrozenSet[str]  # this scope and children <-|
+    deref: T.FrozenSet[str]  # this scope and parents <----|
+    all: T.FrozenSet[str]
+
+
+_code_infos: T.MutableMapping[CodeType, CodeInfo] = weakref.WeakKeyDictionary()
 
 
-def _start_block(frame: FrameType, bind: T.Dict[str, T.Any],
+def code_info(code: CodeType) -> CodeInfo:
+    """Classify the variable names of a code object (cached per code object)."""
+    try:
+        return _code_infos[code]
+    except KeyError:
+        pass
+    cv_fast, cv_global = frozenset(code.co_varnames), frozenset(code.co_names)
+    cv_closure, cv_deref = frozenset(code.co_cellvars), frozenset(code.co_freevars)
+    info = CodeInfo(cv_fast, cv_global, cv_closure, cv_deref,
+                    cv_fast | cv_closure | cv_deref | cv_global)
+    try:
+        _code_infos[code] = info
+    except TypeError:  # no weak references to code objects on this implementation
+        pass
+    return info
+
+
+def _start_block(frame: FrameType, bind: T.Mapping[str, T.Any],
                  warn_unused: bool = False) -> T.Tuple[FrameType, T.Dict[str, T.Dict[str, T.Any]]]:
     """Bind values to the frame scope."""
     # pylint: disable=too-many-locals
     spec = {k: {'bound_value': v} for k, v in bind.items()}
+    # one snapshot for all writes (or the write-through proxy of PEP 667)
     f_locals, f_globals = frame.f_locals, frame.f_globals
-    code = frame.f_code
-    cv_fast = set(code.co_varnames)  # arguments, locals
-    cv_global = set(code.co_names)  # globals
-    cv_closure = set(code.co_cellvars)  # this scope and children <-|
-    cv_deref = set(code.co_freevars)  # this scope and parents <----|
-    cv_local = cv_fast | cv_closure | cv_deref
-    vars_all = cv_local | cv_global  # | set(f_locals.keys()) | set(f_globals.keys())
-    for varname, value in bind.items():
-        f_locals, f_globals = frame.f_locals, frame.f_globals  # always update
-        exists = spec[varname]['exists'] = varname in vars_all
+    info = code_info(frame.f_code)
+    sync = False
+    for varname, vspec in spec.items():
+        value = vspec['bound_value']
+        exists = vspec['exists'] = varname in info.all
         if not exists:
             # TODO:
             # NOTE: This value will be bound, but it will not be removed later
             #       (if it did not exist only???)
-            spec[varname]['access'] = 'GLOBAL_UNBOUND'
-            spec[varname]['target'] = 'f_globals'
-            spec[varname]['exists_in_target'] = varname in f_globals
-            spec[varname]['value_in_target'] = f_globals.get(varname)
-            f_globals[varname] = value
-            continue
-        if varname in cv_fast:  # f_local
-            spec[varname]['access'] = 'FAST'
-            spec[varname]['target'] = 'f_locals'
-            spec[varname]['exists_in_target'] = varname in f_locals
-            spec[varname]['value_in_target'] = f_locals.get(varname)
-            f_locals[varname] = value  # broken?
-            locals_to_fast(frame)
-            assert varname in frame.f_locals
-            assert id(frame.f_locals[varname]) == id(value)
-        elif varname in cv_global:
-            spec[varname]['access'] = 'GLOBAL'
-            spec[varname]['target'] = 'f_globals'
-            spec[varname]['exists_in_target'] = varname in f_globals
-            spec[varname]['value_in_target'] = f_globals.get(varname)
-            f_globals[varname] = value
-        elif varname in cv_closure or varname in cv_deref:
+            vspec['access'] = 'GLOBAL_UNBOUND'
+            target = 'f_globals'
+        elif varname in info.fast:  # f_local
+            vspec['access'] = 'FAST'
+            target = 'f_locals'
+        elif varname in info.globals:
+            vspec['access'] = 'GLOBAL'
+            target = 'f_globals'
+        elif varname in info.closure or varname in info.deref:
             # TODO: double check that code below!
-            m = spec[varname]['access'] = 'CLOSURE' if varname in cv_closure else 'DEREF'
+            m = vspec['access'] = 'CLOSURE' if varname in info.closure else 'DEREF'
             if varname in f_locals:
-                spec[varname]['target'] = 'f_locals'
-                spec[varname]['exists_in_target'] = varname in f_locals
-                spec[varname]['value_in_target'] = f_locals.get(varname)
-                f_locals[varname] = value
-                locals_to_fast(frame)
-                assert varname in frame.f_locals
-                assert id(frame.f_locals[varname]) == id(value)
+                target = 'f_locals'
             elif varname in f_globals:  # Uncovered. Maybe unnecessary?
-                spec[varname]['target'] = 'f_globals'
-                spec[varname]['exists_in_target'] = varname in f_globals
-                spec[varname]['value_in_target'] = f_globals.get(varname)
-                f_globals[varname] = value
-                assert varname in frame.f_globals
-                assert id(frame.f_globals[varname]) == id(value)
+                target = 'f_globals'
             else:  # Uncovered. Maybe unnecessary?
                 print('f_locals:  ', f_locals.keys(), file=sys.stderr)
                 print('f_globals: ', f_locals.keys(), file=sys.stderr)
@@ -116,6 +144,14 @@ def _start_block(frame: FrameType, bind: T.Dict[str, T.Any],
                                           'f_locals or f_globals')
         else:
             raise NotImplementedError('unknown access not yet implemented')
+        namespace = f_locals if target == 'f_locals' else f_globals
+        vspec['target'] = target
+        vspec['exists_in_target'] = varname in namespace
+        vspec['value_in_target'] = namespace.get(varname)
+        namespace[varname] = value
+        sync = sync or target == 'f_locals'
+    if sync:
+        locals_to_fast(frame)  # a single sync for all the local writes
     return frame, spec
 
 
@@ -125,6 +161,7 @@ def _calculate_actions(spec: T.Dict[str, T.Dict[str, T.Any]], config: T.Dict[str
     """Calculate what to do based on spec and config."""
     # pylint: disable=too-many-branches
     to_do = {k: {} for k in spec}
+    identity = config.get('change detection', 'equality') == 'identity'
     for varname, vspec in spec.items():
         if not vspec['exists']:
             continue
@@ -132,7 +169,8 @@ def _calculate_actions(spec: T.Dict[str, T.Dict[str, T.Any]], config: T.Dict[str
         existed_in_target = vspec['exists_in_target']
         value_1, value_2 = vspec['value_in_target'], vspec['bound_value']
         deleted = varname not in target
-        modified = target.get(varname) != value_2 and not deleted
+        current = target.get(varname)
+        modified = not deleted and current is not value_2 and (identity or current != value_2)
         if deleted:
             if existed_in_target:
                 if config.get('deleted existing', 'restore') == 'restore':
@@ -176,29 +214,54 @@ def _calculate_actions(spec: T.Dict[str, T.Dict[str, T.Any]], config: T.Dict[str
 def _end_block(frame: FrameType, spec: T.Dict[str, T.Dict[str, T.Any]],
                config: T.Dict[str, str]) -> None:
     code = frame.f_code
+    # one snapshot for all writes (or the write-through proxy of PEP 667)
     f_locals, f_globals = frame.f_locals, frame.f_globals
     to_do = _calculate_actions(spec, config, f_locals, f_globals)
+    sync, deleted = False, []
     for varname, action_spec in to_do.items():
-        f_locals, f_globals = frame.f_locals, frame.f_globals  # always update
         action = action_spec.get('action')
+        if action is None:
+            continue
+        local = spec[varname]['target'] != 'f_globals'
         if action == 'set':
-            value = action_spec['value']
-            if spec[varname]['target'] == 'f_globals':
-                f_globals[varname] = value
-            else:
-                f_locals.update({**f_locals, varname: value})
-                locals_to_fast(frame)
-                assert varname in frame.f_locals
-                assert id(frame.f_locals[varname]) == id(value)
+            (f_locals if local else f_globals)[varname] = action_spec['value']
         elif action == 'delete':
-            if spec[varname]['target'] == 'f_globals':
-                del f_globals[varname]  # uncovered?
+            if local:
+                try:
+                    del f_locals[varname]
+                except (KeyError, ValueError, TypeError):  # PEP 667: fast locals cannot be
+                    pass  # deleted (TypeError), the check below warns about them
+                deleted.append(varname)
             else:
-                del f_locals[varname]
-                locals_to_fast(frame)
-                if varname in frame.f_locals:
-                    warn(f'Could not delete {varname!r} ({code.co_filename!r}, '
-                         f'in {code.co_name!r} near line {frame.f_lineno})', stacklevel=2)
+                del f_globals[varname]  # uncovered?
+        sync = sync or local
+    if sync:
+        locals_to_fast(frame)  # a single sync for all the local writes
+    if deleted:
+        f_locals = frame.f_locals
+        for varname in deleted:
+            if varname in f_locals:
+                warn(f'Could not delete {varname!r} ({code.co_filename!r}, '
+                     f'in {code.co_name!r} near line {frame.f_lineno})', stacklevel=2)
+
+
+def _split_pairs(pairs: T.Iterable[T.Tuple[object, T.Any]]
+                 ) -> T.Tuple[T.Iterator[T.Any], T.Iterator[object]]:
+    """Split (obj, result or None) pairs into the results and the unmatched objects."""
+    hits, misses = itertools.tee(pairs)
+    return (r for _, r in hits if r is not None), (o for o, r in misses if r is None)
+
+
+def _network_patterns(patterns: T.Tuple[T.Any, ...]
+                      ) -> T.Tuple[T.Optional[PatternNetwork], T.Tuple['ObjectPattern', ...]]:
+    """(network, patterns): a PatternNetwork passed as the only pattern stands for its patterns."""
+    if len(patterns) == 1 and isinstance(patterns[0], PatternNetwork):
+        return patterns[0], patterns[0].patterns
+    return None, patterns
+
+
+def _forced_bound_of(match: T.Optional['ObjectPatternMatch']) -> T.Optional[dict]:
+    return None if match is None else dict(match.bound)
 
 
 class NoMatchingPatternError(ValueError):
@@ -214,7 +277,13 @@ class ObjectPattern:  # pylint: disable=missing-class-docstring,too-few-public-m
 
 
 class ObjectPatternMatch:
-    """A match corresponding to a (pattern, object) pair."""
+    """A match corresponding to a (pattern, object) pair.
+
+    The bindings are also available as attributes (unless shadowed by an attribute
+    of the match itself, like obj or pattern), and iterating over a match yields the
+    bound values in order, so ``keys, values = match`` works without any frame magic.
+    """
+    __slots__ = ('obj', 'pattern', 'bound', 'config', '__f', '__espec')
 
     def __init__(self, obj: object, pattern: ObjectPattern, bound: dict,
                  config: T.Optional[T.Dict[str, str]] = None):
@@ -225,6 +294,24 @@ class ObjectPatternMatch:
     def __bool__(self) -> bool:
         return True
 
+    def __getattr__(self, name: T.Text) -> T.Any:
+        # only called if the normal lookup failed: look the name up in the bindings
+        if name.startswith('__'):
+            raise AttributeError(name)
+        try:
+            return object.__getattribute__(self, 'bound')[name]
+        except (KeyError, AttributeError):
+            raise AttributeError(f'{type(self).__name__!r} object has no attribute or '
+                                 f'binding {name!r}') from None
+
+    def __iter__(self) -> T.Iterator[T.Any]:
+        return iter(self.record())
+
+    def record(self) -> T.Any:
+        """The bindings as an instance of the pattern's ``__slots__`` record type."""
+        bound = self.bound
+        return self.pattern.record_type(*map(bound.__getitem__, self.pattern.bind_names))
+
     def __repr__(self) -> T.Text:
         return f'ObjectPatternMatch({self.obj!r}, {self.pattern!r}, {self.bound!r})'
 
@@ -232,8 +319,8 @@ class ObjectPatternMatch:
         return f'<ObjectPatternMatch bindings={self.bound!r}/>'
 
     def __enter__(self) -> None:
-        # pylint: disable=attribute-defined-outside-init
-        self.__f, self.__espec = _start_block(inspect.currentframe().f_back, self.bound,
+        # pylint: disable=attribute-defined-outside-init,protected-access
+        self.__f, self.__espec = _start_block(sys._getframe(1), self.bound,
                                               self.config.get('warn: unused', False))
         return self
 
@@ -242,113 +329,471 @@ class ObjectPatternMatch:
         del self.__f, self.__espec
         # Do we need to handle exc_type, exc_value, traceback?
 
+    async def __aenter__(self) -> 'ObjectPatternMatch':
+        # pylint: disable=attribute-defined-outside-init,protected-access
+        self.__f, self.__espec = _start_block(sys._getframe(1), self.bound,
+                                              self.config.get('warn: unused', False))
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, trb) -> None:
+        _end_block(self.__f, self.__espec, self.config)
+        del self.__f, self.__espec
+
 
 class ObjectPattern:
     """A pattern that can be applied to any object."""
+    match_type = ObjectPatternMatch
 
     def __init__(self, pattern: dict, verbose: bool = False,
-                 config: T.Optional[T.Dict[str, str]] = None):
+                 config: T.Optional[T.Dict[str, str]] = None,
+                 cache: T.Optional[MatchCache] = None,
+                 profiler: T.Optional[MatchProfiler] = None):
         assert isinstance(pattern, dict)
         self.pattern, self.verbose = pattern, verbose
         self.config = config if isinstance(config, dict) else CONFIG
+        self.cache, self.profiler = cache, profiler
+
+    def enable_cache(self, maxsize: int = 1024,
+                     key: T.Optional[T.Callable[[object], T.Hashable]] = None) -> MatchCache:
+        """Memoize the results of match (only for hashable, immutable objects!).
+
+        The bound values are shared by the cache hits, see pyopm.cache.
+        """
+        self.cache = MatchCache(maxsize, key)
+        return self.cache
+
+    @cproperty
+    def _columnar(self) -> T.Any:
+        from .columnar import ColumnarMatcher
+        return ColumnarMatcher(self)
+
+    def match_columns(self, data: T.Any, eval_globals: dict = None) -> T.Any:
+        """Match all the rows of a NumPy structured array or dict of arrays at once.
+
+        Returns a ColumnarMatch (mask of the matching rows, bindings), see
+        pyopm.columnar. Requires numpy.
+        """
+        return self._columnar.match(data, eval_globals)
+
+    def adapt(self, interval: int = 1000) -> AdaptiveOrder:
+        """Learn a fail-fast test order while matching, reordering every interval matches.
+
+        Call ``freeze()`` on the returned AdaptiveOrder to keep the learned order and
+        stop profiling.
+        """
+        return AdaptiveOrder(self, interval)
 
     def __str__(self) -> T.Text:
+        from pprint import pformat
+        from textwrap import indent
         return ('<ObjectPattern \n'
                 + indent(pformat(self.pattern, width=76), ' ' * 4)
                 + '\n/>')
 
     def __repr__(self) -> T.Text:
+        from pprint import pformat
         return f'<ObjectPattern({pformat(self.pattern)}) />'
 
+    def __getstate__(self) -> dict:
+        # the compiled forms hold code objects and generated functions: rebuild them lazily
+        return {'pattern': self.pattern, 'verbose': self.verbose, 'config': self.config,
+                'cache': None, 'profiler': None}
+
+    def compile(self, bindings_only: bool = False) -> T.Callable[..., T.Any]:
+        """Generate a specialized matcher function (cached), same signature as match.
+
+        The returned function gives exactly the same results as match, but the pattern
+        is unrolled into straight-line code instead of being interpreted on every call.
+        With bindings_only, it returns the dict of bindings instead of a match object.
+        The pattern must not be modified after compiling it.
+        While a profiler is attached, the profiled match is returned instead.
+        """
+        if self.profiler is not None:
+            if bindings_only:
+                return lambda *args, **kwargs: _forced_bound_of(self.match(*args, **kwargs))
+            return self.match
+        attr = '_compiled_bindings' if bindings_only else '_compiled_match'
+        fn = self.__dict__.get(attr)
+        if fn is None:
+            fn = self.__dict__[attr] = build_matcher(self, bindings_only)
+        return fn
+
+    def match_many(self, objects: T.Iterable[object], bindings_only: bool = False,
+                   **match_args) -> T.Iterator[T.Any]:
+        """Lazily match every object, yielding a match (or its bindings) or None for each.
+
+        The pattern is compiled once up front and nothing is kept per object, so
+        unbounded streams can be matched in constant memory.
+        """
+        matcher = self.compile(bindings_only)
+        if match_args:
+            matcher = functools.partial(matcher, **match_args)
+        return map(matcher, objects)
+
+    def filter(self, objects: T.Iterable[object], bindings_only: bool = False,
+               **match_args) -> T.Iterator[T.Any]:
+        """Lazily yield the matches (or their bindings) of the matching objects only."""
+        return (r for r in self.match_many(objects, bindings_only, **match_args)
+                if r is not None)
+
+    def partition(self, objects: T.Iterable[object], bindings_only: bool = False,
+                  **match_args) -> T.Tuple[T.Iterator[T.Any], T.Iterator[object]]:
+        """Split objects into (matches or bindings, objects that did not match).
+
+        Both iterators are lazy. Consuming one of them far ahead of the other buffers
+        the items in between, memory only stays constant if both advance together.
+        """
+        matcher = self.compile(bindings_only)
+        return _split_pairs((obj, matcher(obj, **match_args)) for obj in objects)
+
+    @cproperty
+    def compiled_pattern(self) -> T.List[PathNode]:
+        """Split the keys into attribute path bits and merge them into a path trie."""
+        keys = (key_path(k, v) for k, v in self.pattern.items())
+        return build_path_trie((path, (i, order_tests(tests)))
+                               for i, (path, tests) in enumerate(keys))
+
     @cproperty
-    def compiled_pattern(self) -> dict:
-        """Split the keys into attribute path bits."""
-        return {break_attr_path(k): v for k, v in self.pattern.items()}
+    def _bind_plan(self) -> T.Tuple[T.Tuple[int, T.Tuple[T.Tuple[T.Text, T.Any], ...]], ...]:
+        """(key index, bind items) for all the keys that bind something, in key order."""
+        return tuple((i, tuple(v['bind'].items()))
+                     for i, v in enumerate(self.pattern.values()) if v.get('bind'))
+
+    @cproperty
+    def _bind_template(self) -> T.Dict[T.Text, PendingBinding]:
+        """Pending bindings by name (the last key binding a name wins)."""
+        template = {}
+        for index, binds in self._bind_plan:
+            for var_name, var_eval in binds:
+                template[var_name] = PendingBinding(index, var_eval)
+        return template
+
+    @cproperty
+    def bind_names(self) -> T.Tuple[T.Text, ...]:
+        """The names bound by this pattern, in order."""
+        return tuple(self._bind_template)
+
+    @cproperty
+    def record_type(self) -> type:
+        """The ``__slots__`` based record type of the bindings of this pattern."""
+        return record_type(self.bind_names)
+
+    @cproperty
+    def _overwritten_bindings(self) -> T.Tuple[T.Text, ...]:
+        """The names that are bound more than once (once per overwrite)."""
+        seen, overwritten = set(), []
+        for _, binds in self._bind_plan:
+            for var_name, _ in binds:
+                if var_name in seen:
+                    overwritten.append(var_name)
+                seen.add(var_name)
+        return tuple(overwritten)
+
+    @cproperty
+    def _compiled_binds(self) -> T.Dict[T.Text, CodeType]:
+        """Code objects for the string valued bind expressions."""
+        return {e: compile_cached(e, '<pyopm>', 'eval') for v in self.pattern.values()
+                for e in v.get('bind', {}).values() if isinstance(e, str)}
 
     def match(self, obj: object,
               eval_globals: dict = None,
               eval_locals: dict = None) -> T.Optional[ObjectPatternMatch]:
-        # pylint: disable=too-many-locals
         """Apply the pattern to obj."""
+        if self.profiler is not None:
+            return self.profiler.match(self, obj, eval_globals, eval_locals)
+        cache = self.cache
+        if cache is not None and eval_globals is None and eval_locals is None:
+            bound = cache.lookup(self, obj, lambda: _forced_bound_of(self._match(obj)))
+            return None if bound is None else self.match_type(obj, self, dict(bound),
+                                                              self.config)
+        return self._match(obj, eval_globals, eval_locals)
+
+    async def amatch(self, obj: object, eval_globals: dict = None, eval_locals: dict = None,
+                     limit: T.Optional[T.Union[int, 'asyncio.Semaphore']] = None
+                     ) -> T.Optional[ObjectPatternMatch]:
+        """Apply the pattern to obj, awaiting tests and binds that return awaitables.
+
+        The asynchronous tests run concurrently (at most limit at a time), the first
+        failure cancels the others. The bindings are computed eagerly. Caches and
+        profilers are not used.
+        """
+        from .aio import amatch  # deferred: asyncio is slow to import
+        return await amatch(self, obj, eval_globals, eval_locals, limit)
+
+    def _match(self, obj: object, eval_globals: dict = None,
+               eval_locals: dict = None) -> T.Optional[ObjectPatternMatch]:
+        # pylint: disable=too-many-locals,too-many-branches
         verbose = self.verbose
-        eval_locals = ({'obj': obj, **eval_locals} if isinstance(eval_locals, dict)
-                       else {'obj': obj})
-        object_cache, bound = {}, {}
-
-        def evalp(s):
-            nonlocal eval_globals, eval_locals
-            # Ugly, I know...
-            # But now we don't have to deal with __getitem__ etc...
-            return eval(s, eval_globals, eval_locals)
-
-        for kt, v in self.compiled_pattern.items():
-            for i in range(len(kt)):
-                skt = kt[:i + 1]
-                sk = ''.join(skt)
-                if skt not in object_cache:
+        extra_locals = eval_locals if isinstance(eval_locals, dict) else {}
+        root = extra_locals.get('obj', obj)
+        eval_locals = None  # only built if a step or bind actually needs eval
+        values = [None] * len(self.pattern)
+
+        stack = [(node, None) for node in reversed(self.compiled_pattern)]
+        while stack:
+            node, o = stack.pop()
+            kind = node.kind
+            try:
+                if kind == STEP_GET:
+                    o = node.accessor(o)
+                elif kind == STEP_ROOT:
+                    o = root
+                elif kind == STEP_EVAL:
+                    if eval_locals is None:
+                        eval_locals = {'obj': obj, **extra_locals}
+                    o = eval(node.accessor, eval_globals, eval_locals)
+                else:
+                    raise node.accessor
+            except Exception as e:
+                if verbose:
+                    warn(f'Missing attribute? {node.source!r}, {e}')
+                return None
+            for index, tests in node.keys:
+                for test_func in tests:
                     try:
-                        object_cache[skt] = evalp(sk)
+                        if not bool(test_func(o)):
+                            if verbose:
+                                warn(f'Test failed: {test_func!r} ({node.path!r}: {o!r})')
+                            return None
                     except Exception as e:
-                        if verbose:
-                            warn(f'Missing attribute? {sk!r}, {e}')
-                        return None
-            o = object_cache[kt]
-            for test_func in v.get('eval', []):
-                try:
-                    if not bool(test_func(o)):
-                        if verbose:
-                            warn(f'Test failed: {test_func!r} ({kt!r}: {o!r})')
+                        warn(f'Error running {test_func!r} ({node.path!r}: {o!r}): {e}')
                         return None
-                except Exception as e:
-                    warn(f'Error running {test_func!r} ({kt!r}: {o!r}): {e}')
-                    return None
-            for var_name, var_eval in v.get('bind', {}).items():
+                values[index] = o
+            if node.children:
+                stack.extend((c, o) for c in reversed(node.children))
+
+        return self._make_match(obj, values, eval_globals, extra_locals, eval_locals)
+
+    def _make_match(self, obj: object, values: T.Sequence[T.Any], eval_globals: T.Optional[dict],
+                    extra_locals: dict, eval_locals: T.Optional[dict] = None) -> ObjectPatternMatch:
+        """Create the match, the bindings are computed lazily from the key values."""
+        # pylint: disable=unused-argument
+        if self.verbose:
+            for var_name in self._overwritten_bindings:
+                warn(f'Overwriting binding for {var_name!r}')
+        return ObjectPatternMatch(obj, self, LazyBindings(self, obj, values, eval_globals,
+                                                          extra_locals), self.config)
+
+    def _make_bound(self, obj: object, values: T.Sequence[T.Any], eval_globals: T.Optional[dict],
+                    extra_locals: dict, eval_locals: T.Optional[dict] = None) -> dict:
+        """Compute the bindings from the resolved key values."""
+        verbose, bound = self.verbose, {}
+        for index, binds in self._bind_plan:
+            o = values[index]
+            for var_name, var_eval in binds:
                 if verbose and var_name in bound:
                     warn(f'Overwriting binding for {var_name!r}')
-                bound[var_name] = (var_eval(o) if callable(var_eval) else
-                                   (eval(var_eval, eval_globals, {**eval_locals, 'o': o})
-                                    if isinstance(var_eval, str) else o))
-
-        return ObjectPatternMatch(obj, self, bound, self.config)
+                if callable(var_eval):
+                    bound[var_name] = var_eval(o)
+                elif isinstance(var_eval, str):
+                    if eval_locals is None:
+                        eval_locals = {'obj': obj, **extra_locals}
+                    bound[var_name] = eval(self._compiled_binds[var_eval], eval_globals,
+                                           {**eval_locals, 'o': o})
+                else:
+                    bound[var_name] = o
+        return bound
 
 
 class ObjectMultiPattern:
-    """Implement matching against multiple patterns functionality."""
+    """Implement matching against multiple patterns functionality.
+
+    strategy selects how the patterns are evaluated:
+
+    - ``'all'``: match all the patterns eagerly (through a shared network),
+      ambiguities raise an AmbiguityError unless allow_ambiguities is set.
+    - ``'first_match'``: match the patterns in order and stop at the first success.
+    - ``'lazy'``: nothing is matched up front, ``matches`` is a generator that
+      matches the patterns on demand.
+
+    For ``'first_match'`` and ``'lazy'``, ambiguity checking is opt-in: pass
+    ``allow_ambiguities=False`` to match all remaining patterns when needed.
+
+    The patterns can also be given as one PatternNetwork: reusing it saves hashing
+    the whole pattern tuple to find the cached network, for every object.
+
+    A MatchCache passed as cache memoizes the results of the ``'all'`` strategy per
+    (patterns, object); the other strategies use the caches of the patterns.
+
+    A MatchProfiler passed as profiler profiles every pattern (one at a time, without
+    the network) and counts the wins of the pattern picked by the with block.
+    """
     # TODO: match method?
+    STRATEGIES = ('all', 'first_match', 'lazy')
 
     def __init__(self, obj: object, *patterns: T.Iterable[ObjectPattern],
-                 allow_ambiguities: bool = False, config: T.Optional[dict] = None,
-                 **match_args):
+                 allow_ambiguities: T.Optional[bool] = None, config: T.Optional[dict] = None,
+                 strategy: T.Text = 'all', cache: T.Optional[MatchCache] = None,
+                 profiler: T.Optional[MatchProfiler] = None, **match_args):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f'Unknown strategy {strategy!r}, expected one of {self.STRATEGIES}')
         self.obj = obj
-        self.patterns = list(patterns)
-        self.matches = [p.match(obj, **match_args) for p in self.patterns]
+        network, self.patterns = _network_patterns(patterns)
+        self.strategy, self.profiler = strategy, profiler
+        if strategy == 'all':
+            if profiler is not None:
+                found = [(i, profiler.match(p, obj, **match_args))
+                         for i, p in enumerate(self.patterns)]
+                self._found = [(i, m) for i, m in found if m is not None]
+            else:
+                if network is None:
+                    network = pattern_network(self.patterns)
+                if cache is not None and not match_args:
+                    bounds = cache.lookup(network, obj, lambda: tuple(network.match_all(
+                        obj, bindings_only=True)))
+                    self._found = []
+                    for i, b in bounds:
+                        p = self.patterns[i]
+                        self._found.append((i, p.match_type(obj, p, dict(b), p.config)))
+                else:
+                    self._found = network.match_all(obj, **match_args)
+            self._pending = iter(())
+        else:
+            self._evaluated = []
+            self._pending = self._iter_matches(match_args)
+            if strategy == 'first_match':
+                self._first_success()
+                self.matches = self._evaluated
+            else:
+                self.matches = self._pending
         self.match = None
-        self.allow_ambiguities = allow_ambiguities
+        self.allow_ambiguities = (strategy != 'all' if allow_ambiguities is None
+                                  else allow_ambiguities)
         self.config = config if isinstance(config, dict) else CONFIG
 
+    @classmethod
+    def match_many(cls, objects: T.Iterable[object], *patterns: ObjectPattern,
+                   strategy: T.Text = 'all', allow_ambiguities: T.Optional[bool] = None,
+                   bindings_only: bool = False, **match_args
+                   ) -> T.Iterator[T.Optional[T.Tuple[int, T.Any]]]:
+        """Lazily pick the match of every object: yield (pattern index, match) or None.
+
+        The rules of the with block apply without creating an instance per object:
+        checked ambiguities raise an AmbiguityError (or warn if they are allowed).
+        With bindings_only, the dicts of bindings are yielded instead of match objects.
+        The patterns are compiled once, memory stays constant for unbounded streams.
+        """
+        if strategy not in cls.STRATEGIES:
+            raise ValueError(f'Unknown strategy {strategy!r}, expected one of {cls.STRATEGIES}')
+        if allow_ambiguities is None:
+            allow_ambiguities = strategy != 'all'
+        network, patterns = _network_patterns(patterns)
+        if strategy == 'all' or not allow_ambiguities:
+            if network is None:
+                network = pattern_network(patterns)
+            return cls._match_many_all(objects, network, allow_ambiguities,
+                                       bindings_only, match_args)
+        return cls._match_many_first([p.compile(bindings_only) for p in patterns],
+                                     objects, match_args)
+
+    @staticmethod
+    def _match_many_all(objects, network, allow_ambiguities, bindings_only, match_args):
+        for obj in objects:
+            found = network.match_all(obj, bindings_only=bindings_only, **match_args)
+            if len(found) > 1:
+                if allow_ambiguities:
+                    warn(f'Ambiguity: {len(found)} patterns matched!')
+                else:
+                    raise AmbiguityError(f'{obj!r} matched {len(found)} patterns!')
+            yield found[0] if found else None
+
+    @staticmethod
+    def _match_many_first(matchers, objects, match_args):
+        for obj in objects:
+            for i, matcher in enumerate(matchers):
+                r = matcher(obj, **match_args)
+                if r is not None:
+                    yield i, r
+                    break
+            else:
+                yield None
+
+    @classmethod
+    def filter(cls, objects: T.Iterable[object], *patterns: ObjectPattern,
+               **kwargs) -> T.Iterator[T.Tuple[int, T.Any]]:
+        """Like match_many, but only yield the (pattern index, match) pairs of matches."""
+        return (r for r in cls.match_many(objects, *patterns, **kwargs) if r is not None)
+
+    @classmethod
+    def partition(cls, objects: T.Iterable[object], *patterns: ObjectPattern,
+                  **kwargs) -> T.Tuple[T.Iterator[T.Tuple[int, T.Any]], T.Iterator[object]]:
+        """Split objects into ((pattern index, match) pairs, objects without a match).
+
+        Both iterators are lazy, see ObjectPattern.partition for the memory caveat.
+        """
+        objects, to_match = itertools.tee(objects)
+        return _split_pairs(zip(objects, cls.match_many(to_match, *patterns, **kwargs)))
+
+    def _iter_matches(self, match_args: dict) -> T.Iterator[T.Optional[ObjectPatternMatch]]:
+        """Match the patterns that have not been evaluated yet, one at a time."""
+        profiler = self.profiler
+        for p in self.patterns[len(self._evaluated):]:
+            m = (p.match(self.obj, **match_args) if profiler is None
+                 else profiler.match(p, self.obj, **match_args))
+            self._evaluated.append(m)
+            yield m
+
+    def _first_success(self) -> T.Optional[T.Tuple[int, ObjectPatternMatch]]:
+        """(index, match) of the first successful match, evaluating only as far as needed."""
+        if self.strategy == 'all':
+            return self._found[0] if self._found else None
+        for i, m in enumerate(self._evaluated):
+            if m is not None:
+                return i, m
+        for m in self._pending:
+            if m is not None:
+                return len(self._evaluated) - 1, m
+        return None
+
+    @property
+    def _checks_ambiguities(self) -> bool:
+        return self.strategy == 'all' or not self.allow_ambiguities
+
     @cproperty
     def successful_matches(self) -> T.Dict[int, T.Union[ObjectPatternMatch, None]]:
         """A dictionary containing all the successfull matches."""
+        if self.strategy == 'all':
+            return dict(self._found)
+        for _ in self._pending:  # lazy strategies: evaluate the remaining patterns
+            pass
         return dict(filter(lambda t: isinstance(t[1], ObjectPatternMatch),
-                           enumerate(self.matches)))
+                           enumerate(self._evaluated)))
+
+    @cproperty
+    def matches(self) -> T.List[T.Optional[ObjectPatternMatch]]:
+        """The match of every pattern (None if it failed), built on first access for 'all'."""
+        matches = [None] * len(self.patterns)
+        for i, m in self._found:
+            matches[i] = m
+        return matches
 
     def __len__(self) -> int:
         return len(self.successful_matches)
 
     def __bool__(self) -> bool:
-        return len(self) == 1
+        if self._checks_ambiguities:
+            return len(self) == 1
+        return self._first_success() is not None
 
     def __enter__(self) -> None:
-        # pylint: disable=attribute-defined-outside-init
-        if len(self) > 1:
-            if self.allow_ambiguities:
-                warn(f'Ambiguity: {len(self)} patterns matched!')
-            else:
-                raise AmbiguityError(f'{self.obj!r} matched {len(self)} patterns!')
-        elif not self:
-            raise NoMatchingPatternError(f'{self.obj!r} did not match any pattern!')
-        self.match = min(self.successful_matches.items())[1]
-        self.__f, self.__espec = _start_block(inspect.currentframe().f_back,
+        # pylint: disable=attribute-defined-outside-init,protected-access
+        if self._checks_ambiguities:
+            if len(self) > 1:
+                if self.allow_ambiguities:
+                    warn(f'Ambiguity: {len(self)} patterns matched!')
+                else:
+                    raise AmbiguityError(f'{self.obj!r} matched {len(self)} patterns!')
+            elif not self:
+                raise NoMatchingPatternError(f'{self.obj!r} did not match any pattern!')
+            self.match = min(self.successful_matches.items())[1]
+        else:
+            first = self._first_success()
+            if first is None:
+                raise NoMatchingPatternError(f'{self.obj!r} did not match any pattern!')
+            self.match = first[1]
+        if self.profiler is not None:
+            self.profiler.record_win(self.match.pattern)
+        self.__f, self.__espec = _start_block(sys._getframe(1),
                                               self.match.bound,
                                               self.config.get('warn: unused', False))
         return self
@@ -359,5 +804,106 @@ class ObjectMultiPattern:
         # Do we need to handle exc_type, exc_value, traceback?
 
 
-matcher_pattern = ObjectPattern({'obj.match': {'eval': [callable]}})
-# matches re.Pattern, ObjectPattern, ...
+class AsyncObjectMultiPattern:
+    """The asyncio variant of ObjectMultiPattern, for ``async with`` blocks.
+
+    Awaiting ``evaluate`` (the ``async with`` block does it) matches the patterns
+    concurrently with ``amatch``, their asynchronous tests and binds share the
+    concurrency limit. The remaining work is cancelled as soon as the result is
+    decided: for the ``'first_match'`` strategy, a successful match cancels the
+    patterns after it (the pattern with the lowest index still wins); when
+    ambiguities are checked, a second successful match cancels all the others.
+    Patterns that were cancelled are reported as not matching.
+    """
+    STRATEGIES = ('all', 'first_match')
+
+    def __init__(self, obj: object, *patterns: ObjectPattern,
+                 allow_ambiguities: T.Optional[bool] = None, config: T.Optional[dict] = None,
+                 strategy: T.Text = 'all',
+                 limit: T.Optional[T.Union[int, 'asyncio.Semaphore']] = None, **match_args):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f'Unknown strategy {strategy!r}, expected one of {self.STRATEGIES}')
+        self.obj, self.patterns, self.strategy = obj, list(patterns), strategy
+        self.allow_ambiguities = (strategy != 'all' if allow_ambiguities is None
+                                  else allow_ambiguities)
+        self.config = config if isinstance(config, dict) else CONFIG
+        self.limit, self.match_args = limit, match_args
+        self.matches: T.Optional[T.List[T.Optional[ObjectPatternMatch]]] = None
+        self.match = None
+
+    @property
+    def _checks_ambiguities(self) -> bool:
+        return self.strategy == 'all' or not self.allow_ambiguities
+
+    @property
+    def successful_matches(self) -> T.Dict[int, ObjectPatternMatch]:
+        """The successful matches by pattern index (empty until evaluated)."""
+        return {i: m for i, m in enumerate(self.matches or ()) if m is not None}
+
+    async def evaluate(self) -> T.Dict[int, ObjectPatternMatch]:
+        """Match the patterns (once), return the successful matches."""
+        if self.matches is not None:
+            return self.successful_matches
+        import asyncio
+        from .aio import cancel_all, _semaphore
+        semaphore = _semaphore(self.limit)
+        tasks = {asyncio.ensure_future(p.amatch(self.obj, limit=semaphore, **self.match_args)): i
+                 for i, p in enumerate(self.patterns)}
+        matches: T.List[T.Optional[ObjectPatternMatch]] = [None] * len(self.patterns)
+        checks, pending, found = self._checks_ambiguities, set(tasks), 0
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    m = task.result()
+                    if m is not None:
+                        matches[tasks[task]] = m
+                        found += 1
+                if not found:
+                    continue
+                if checks:
+                    if found > 1 and not self.allow_ambiguities:
+                        break  # decided: ambiguous
+                    continue
+                best = min(i for i, m in enumerate(matches) if m is not None)
+                later = {t for t in pending if tasks[t] > best}
+                await cancel_all(later)
+                pending -= later
+        finally:
+            await cancel_all(pending)
+        self.matches = matches
+        return self.successful_matches
+
+    async def __aenter__(self) -> 'AsyncObjectMultiPattern':
+        # pylint: disable=attribute-defined-outside-init,protected-access
+        frame = sys._getframe(1)
+        successful = await self.evaluate()
+        if not successful:
+            raise NoMatchingPatternError(f'{self.obj!r} did not match any pattern!')
+        if self._checks_ambiguities and len(successful) > 1:
+            if not self.allow_ambiguities:
+                raise AmbiguityError(f'{self.obj!r} matched {len(successful)} patterns!')
+            warn(f'Ambiguity: {len(successful)} patterns matched!')
+        self.match = min(successful.items())[1]
+        self.__f, self.__espec = _start_block(frame, self.match.bound,
+                                              self.config.get('warn: unused', False))
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, trb) -> None:
+        _end_block(self.__f, self.__espec, self.config)
+        del self.__f, self.__espec
+
+
+def _matcher_pattern() -> ObjectPattern:
+    # matches re.Pattern, ObjectPattern, ...
+    return ObjectPattern({'obj.match': {'eval': [callable]}})
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name: T.Text) -> T.Any:
+        if name == 'matcher_pattern':  # built on first use
+            value = globals()[name] = _matcher_pattern()
+            return value
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+else:  # no module __getattr__ (PEP 562)
+    matcher_pattern = _matcher_pattern()
@@ -0,0 +1,136 @@
+"""An on-disk cache of compiled pattern artifacts, for fast startup.
+
+Building thousands of patterns spends most of its time compiling: the generated
+matcher functions, the paths that have to be evaluated, the bind expressions and
+parsing the paths. A CompileCache stores these artifacts (code objects and parsed
+segments) in one marshal file. Every entry is keyed by a hash of its source, so
+changed pattern definitions simply miss and get compiled again, and saving only
+keeps the entries used since the cache was loaded, which drops the stale ones.
+The file is ignored if it was written by another Python version (the bytecode
+magic number is part of the header) or if it cannot be read::
+
+    cache = CompileCache('/var/cache/app/patterns.pyopm')
+    patterns = cache.warm(build_patterns())  # compiles everything, saves if needed
+
+The predicates, bind callables and dispatch indexes (PatternNetwork,
+PatternRegistry) reference live objects and are rebuilt from the patterns,
+fast once the compiled artifacts come from the cache.
+"""
+import os
+import marshal
+import importlib.util
+import typing as T
+
+MAGIC = b'PYOPM-CACHE-1\n' + importlib.util.MAGIC_NUMBER
+_active: T.List['CompileCache'] = []
+
+
+def active() -> T.Optional['CompileCache']:
+    """The CompileCache in use (entered with ``with``), or None."""
+    return _active[-1] if _active else None
+
+
+def digest(source: T.Text) -> T.Text:
+    """The sha256 hex digest of source."""
+    import hashlib  # pylint: disable=import-outside-toplevel
+    return hashlib.sha256(source.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def compile_cached(source: T.Text, filename: T.Text, mode: T.Text) -> T.Any:
+    """``compile(source, filename, mode)``, through the active cache if there is one."""
+    cache = active()
+    if cache is None:
+        return compile(source, filename, mode)
+    return cache.get(f'{mode}\0{filename}', source, lambda: compile(source, filename, mode))
+
+
+class CompileCache:
+    """A marshal file of compiled artifacts keyed by source hashes."""
+
+    def __init__(self, path: T.Union[T.Text, 'os.PathLike']):
+        self.path = os.fspath(path)
+        self._entries: T.Dict[T.Text, T.Any] = {}
+        self._used: T.Set[T.Text] = set()
+        self.hits = self.misses = self._added = 0
+        self.load()
+
+    def __repr__(self) -> T.Text:
+        return f'<CompileCache {self.path!r} {self.stats()!r}/>'
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> T.Dict[T.Text, int]:
+        """Hit/miss statistics and the number of entries."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def load(self) -> bool:
+        """(Re)load the file, return whether it was valid."""
+        self._entries, self._used, self._added = {}, set(), 0
+        try:
+            with open(self.path, 'rb') as fh:
+                data = fh.read()
+            if not data.startswith(MAGIC):
+                return False
+            entries = marshal.loads(data[len(MAGIC):])
+        except (OSError, ValueError, EOFError, TypeError):
+            return False
+        if not isinstance(entries, dict):
+            return False
+        self._entries = entries
+        return True
+
+    def save(self) -> None:
+        """Atomically write the entries used since loading (stale ones are dropped)."""
+        entries = {k: v for k, v in self._entries.items() if k in self._used}
+        import tempfile  # pylint: disable=import-outside-toplevel
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.pyopm-cache-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(MAGIC + marshal.dumps(entries))
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._entries, self._added = entries, 0
+
+    @property
+    def dirty(self) -> bool:
+        """Whether saving would change the file (new or stale entries)."""
+        return self._added > 0 or len(self._used) != len(self._entries)
+
+    def get(self, kind: T.Text, source: T.Text, compute: T.Callable[[], T.Any]) -> T.Any:
+        """The cached artifact of the given kind for source, computed (and stored) if needed.
+
+        The value must be marshal-able.
+        """
+        key = kind + '\0' + digest(source)
+        self._used.add(key)
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            self._added += 1
+            value = self._entries[key] = compute()
+        else:
+            self.hits += 1
+        return value
+
+    def __enter__(self) -> 'CompileCache':
+        _active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, trb) -> None:
+        _active.remove(self)
+
+    def warm(self, patterns: T.Iterable[T.Any], bindings_only: bool = False) -> T.List[T.Any]:
+        """Compile the patterns (trie and matcher) through the cache, save it if it changed."""
+        patterns = list(patterns)
+        with self:
+            for p in patterns:
+                p.compile(bindings_only)
+                _ = p._compiled_binds  # pylint: disable=protected-access
+        if self.dirty:
+            self.save()
+        return patterns
@@ -0,0 +1,189 @@
+"""Match an object against a whole set of patterns using one shared network.
+
+The keys of all patterns are merged into a single path trie, so every distinct
+path is resolved at most once per object and every distinct predicate at a path
+is run at most once, no matter how many patterns share it. Cheap declarative
+predicates run first, and equality tests (``Eq``) on the same path are replaced
+by a single dict lookup. The set of patterns
+that are still alive is tracked as a bit mask, which lets whole subtrees be
+skipped as soon as no pattern needs them anymore.
+"""
+import functools
+import typing as T
+from warnings import warn
+
+from .paths import key_path, build_path_trie, STEP_ROOT, STEP_GET, STEP_EVAL
+from .predicates import Eq, predicate_key, order_tests
+
+
+def _index_equalities(tests: T.Dict[T.Any, list]) -> T.Tuple[T.Optional[dict], int]:
+    """Move the Eq tests of a node into a {value: pattern mask} dict (if worth it).
+
+    Returns the index and the mask of the patterns constrained by it.
+    """
+    indexable = []
+    for key, (pred, mask) in tests.items():
+        if type(pred) is Eq:  # pylint: disable=unidiomatic-typecheck
+            try:
+                hash(pred.value)
+                if pred.value == pred.value:  # NaN & co would never match
+                    indexable.append((key, pred.value, mask))
+            except Exception:  # pylint: disable=broad-except
+                pass
+    seen = dup = 0
+    for _, _, mask in indexable:
+        dup |= seen & mask
+        seen |= mask
+    # patterns with several Eq tests on the same path keep running them one by one
+    indexable = [t for t in indexable if t[2] & ~dup]
+    if len(indexable) < 2:
+        return None, 0
+    index, eq_mask = {}, 0
+    for key, value, mask in indexable:
+        index[value] = index.get(value, 0) | (mask & ~dup)
+        eq_mask |= mask & ~dup
+        if mask & dup:
+            tests[key][1] = mask & dup
+        else:
+            del tests[key]
+    return index, eq_mask
+
+
+class PatternNetwork:
+    """A set of ObjectPatterns compiled into one discrimination network."""
+
+    def __init__(self, patterns: T.Iterable[T.Any]):
+        # pylint: disable=too-many-locals
+        self.patterns = tuple(patterns)
+        items = []
+        for pi, p in enumerate(self.patterns):
+            for ki, (k, v) in enumerate(p.pattern.items()):
+                path, tests = key_path(k, v)
+                items.append((path, (pi, ki, tests)))
+        verbose_mask = sum(1 << pi for pi, p in enumerate(self.patterns) if p.verbose)
+        self.verbose_mask = verbose_mask
+        self.all_mask = (1 << len(self.patterns)) - 1
+        key_slots = [[None] * len(p.pattern) for p in self.patterns]
+        nodes = []
+
+        def flatten(node, parent):
+            slot = len(nodes)
+            nodes.append(None)
+            mask, tests = 0, {}
+            for pi, ki, preds in node.keys:
+                key_slots[pi][ki] = slot
+                mask |= 1 << pi
+                for pred in preds:
+                    entry = tests.setdefault(predicate_key(pred), [pred, 0])
+                    entry[1] |= 1 << pi
+            for c in node.children:
+                mask |= flatten(c, slot)
+            eq_index, eq_mask = _index_equalities(tests)
+            ordered = order_tests(pred for pred, _ in tests.values())
+            tests = {predicate_key(pred): tmask for pred, tmask in tests.values()}
+            nodes[slot] = (parent, node.kind, node.accessor, node.source, node.path, mask,
+                           tuple((pred, tests[predicate_key(pred)]) for pred in ordered),
+                           len(nodes), eq_index, eq_mask)
+            return mask
+
+        for root in build_path_trie(items):
+            flatten(root, None)
+        self.nodes = tuple(nodes)
+        self.key_slots = tuple(map(tuple, key_slots))
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def __repr__(self) -> T.Text:
+        return f'<PatternNetwork patterns={len(self.patterns)} paths={len(self.nodes)}/>'
+
+    @property
+    def test_count(self) -> int:
+        """The number of distinct (path, predicate) tests in the network."""
+        return sum(len(n[6]) + len(n[8] or ()) for n in self.nodes)
+
+    def match_all(self, obj: object, eval_globals: dict = None, eval_locals: dict = None,
+                  bindings_only: bool = False) -> T.List[T.Tuple[int, T.Any]]:
+        """Match obj against all patterns, return the (pattern index, match) pairs of the matches.
+
+        The successful entries of ``[p.match(obj) for p in patterns]``, in pattern
+        order; nothing is allocated for the patterns that fail. With bindings_only,
+        the dicts of bindings are returned instead of match objects.
+        """
+        # pylint: disable=too-many-locals,too-many-branches
+        extra_locals = eval_locals if isinstance(eval_locals, dict) else {}
+        root = extra_locals.get('obj', obj)
+        eval_locals = None
+        nodes, verbose_mask = self.nodes, self.verbose_mask
+        alive, values = self.all_mask, [None] * len(nodes)
+        i, n = 0, len(nodes)
+        while i < n:
+            parent, kind, accessor, source, path, mask, tests, end, eq_index, eq_mask = nodes[i]
+            if not alive & mask:
+                i = end
+                continue
+            try:
+                if kind == STEP_GET:
+                    o = accessor(values[parent])
+                elif kind == STEP_ROOT:
+                    o = root
+                elif kind == STEP_EVAL:
+                    if eval_locals is None:
+                        eval_locals = {'obj': obj, **extra_locals}
+                    o = eval(accessor, eval_globals, eval_locals)
+                else:
+                    raise accessor
+            except Exception as e:  # pylint: disable=broad-except
+                if alive & mask & verbose_mask:
+                    warn(f'Missing attribute? {source!r}, {e}')
+                alive &= ~mask
+                i = end
+                continue
+            values[i] = o
+            if alive & eq_mask:
+                try:
+                    failed = alive & eq_mask & ~eq_index.get(o, 0)
+                except TypeError:  # unhashable: run the equality tests one by one
+                    failed = 0
+                    for value, tmask in eq_index.items():
+                        if alive & tmask & ~failed and not o == value:
+                            failed |= tmask
+                if failed:
+                    if failed & verbose_mask:
+                        warn(f'Test failed: equality index ({path!r}: {o!r})')
+                    alive &= ~failed
+            for test_func, tmask in tests:
+                if not alive & tmask:
+                    continue
+                try:
+                    if not bool(test_func(o)):
+                        if alive & tmask & verbose_mask:
+                            warn(f'Test failed: {test_func!r} ({path!r}: {o!r})')
+                        alive &= ~tmask
+                except Exception as e:  # pylint: disable=broad-except
+                    warn(f'Error running {test_func!r} ({path!r}: {o!r}): {e}')
+                    alive &= ~tmask
+            if not alive:
+                break
+            i += 1
+
+        matches = []
+        make = '_make_bound' if bindings_only else '_make_match'
+        while alive:
+            low = alive & -alive
+            alive ^= low
+            pi = low.bit_length() - 1
+            matches.append((pi, getattr(self.patterns[pi], make)(
+                obj, [values[s] for s in self.key_slots[pi]], eval_globals, extra_locals,
+                eval_locals)))
+        return matches
+
+
+@functools.lru_cache(maxsize=128)
+def pattern_network(patterns: T.Tuple[T.Any, ...]) -> PatternNetwork:
+    """Get the (cached) network for a tuple of patterns.
+
+    Hashing the tuple costs time proportional to its length: for large pattern sets
+    matched often, keep the PatternNetwork and pass it instead of the patterns.
+    """
+    return PatternNetwork(patterns)
@@ -0,0 +1,157 @@
+"""Function overloading: dispatch calls on patterns of the arguments.
+
+Every implementation declares an ObjectPattern whose ``obj`` is a namespace of
+the arguments, bound to the signature of that implementation (defaults applied)::
+
+    @overload({'obj.x': {'eval': [IsInstance(int)]}})
+    def describe(x):
+        return 'an int'
+
+    @describe.register({'obj.x': {'eval': [IsInstance(str), Len(Range(1, 4))]}})
+    def describe(x):
+        return 'a short string'
+
+A call runs the single implementation whose signature accepts the arguments and
+whose pattern matches them. Like ObjectMultiPattern, no match raises a
+NoMatchingPatternError and several matches raise an AmbiguityError.
+
+Patterns that only test ``obj.<parameter>`` keys with IsInstance predicates are
+purely type-based: their verdict only depends on the types of the arguments
+(and on which keywords are given), so it is cached per tuple of argument types.
+Other patterns are matched on every call, but only if the type-based parts of
+their patterns can match.
+"""
+import inspect
+import functools
+import typing as T
+from types import MethodType, SimpleNamespace
+
+from .core import ObjectPattern, NoMatchingPatternError, AmbiguityError
+from .predicates import IsInstance
+
+
+class Implementation(T.NamedTuple):
+    """An implementation of an Overload and what is needed to dispatch to it."""
+    pattern: ObjectPattern
+    func: T.Callable
+    signature: inspect.Signature
+    guards: T.Tuple[T.Tuple[T.Text, T.Tuple[type, ...]], ...]  # (parameter, types) pairs
+    pure: bool  # the guards are the whole pattern
+
+
+def type_guards(pattern: ObjectPattern, signature: inspect.Signature
+                ) -> T.Tuple[T.Tuple[T.Tuple[T.Text, T.Tuple[type, ...]], ...], bool]:
+    """The (parameter, types) isinstance tests of a pattern, and whether that is all of it."""
+    guards, pure = [], True
+    for key, spec in pattern.pattern.items():
+        name = key[4:] if key.startswith('obj.') else None
+        if name is None or name not in signature.parameters:
+            pure = False
+            continue
+        for test in spec.get('eval', ()):
+            if isinstance(test, IsInstance):
+                guards.append((name, test.types))
+            else:
+                pure = False
+    return tuple(guards), pure
+
+
+class Overload:
+    """A function dispatching to the implementation whose pattern matches the arguments."""
+
+    def __init__(self, name: T.Text = 'overload'):
+        self.__name__ = self.__qualname__ = name
+        self.implementations: T.List[Implementation] = []
+        self._cache: T.Dict[T.Any, T.Tuple[T.Optional[T.Callable], T.Tuple[Implementation, ...]]] \
+            = {}
+
+    def __repr__(self) -> T.Text:
+        return f'<Overload {self.__qualname__} implementations={len(self.implementations)}/>'
+
+    def add(self, pattern: T.Union[ObjectPattern, dict], func: T.Callable) -> None:
+        """Add an implementation (and invalidate the cache)."""
+        if isinstance(pattern, dict):
+            pattern = ObjectPattern(pattern)
+        signature = inspect.signature(func)
+        self.implementations.append(Implementation(pattern, func, signature,
+                                                   *type_guards(pattern, signature)))
+        self.clear_cache()
+
+    def register(self, pattern: T.Union[ObjectPattern, dict]
+                 ) -> T.Callable[[T.Callable], 'Overload']:
+        """Decorator adding an implementation, returns the overload itself."""
+        def decorator(func: T.Callable) -> 'Overload':
+            self.add(pattern, func)
+            return self
+        return decorator
+
+    def clear_cache(self) -> None:
+        """Forget the cached resolutions, e.g. after registering classes with an ABC."""
+        self._cache.clear()
+
+    def _candidates(self, args: tuple, kwargs: dict
+                    ) -> T.Tuple[T.Optional[T.Callable], T.Tuple[Implementation, ...]]:
+        """(resolved function or None, implementations passing the type guards)."""
+        candidates = []
+        for impl in self.implementations:
+            try:
+                arguments = impl.signature.bind(*args, **kwargs)
+            except TypeError:
+                continue
+            arguments.apply_defaults()
+            values = arguments.arguments
+            if all(isinstance(values[name], types) for name, types in impl.guards):
+                candidates.append(impl)
+        candidates = tuple(candidates)
+        pure = all(impl.pure for impl in candidates)
+        return (candidates[0].func if pure and len(candidates) == 1 else None), candidates
+
+    def _fail(self, count: int, args: tuple, kwargs: dict) -> T.NoReturn:
+        call = ', '.join([*map(repr, args), *(f'{k}={v!r}' for k, v in kwargs.items())])
+        if count:
+            raise AmbiguityError(f'{self.__qualname__}({call}) matched {count} patterns!')
+        raise NoMatchingPatternError(f'{self.__qualname__}({call}) did not match any pattern!')
+
+    def resolve(self, *args, **kwargs) -> T.Callable:
+        """The implementation that would be called with these arguments."""
+        key = (tuple([type(a) for a in args]),
+               tuple([(k, type(v)) for k, v in kwargs.items()]) if kwargs else ())
+        try:
+            func, candidates = self._cache[key]
+        except KeyError:
+            if any(type(a) is not a.__class__ for a in (*args, *kwargs.values())):
+                func, candidates = self._candidates(args, kwargs)  # proxies: do not cache
+            else:
+                func, candidates = self._cache[key] = self._candidates(args, kwargs)
+        if func is not None:
+            return func
+        matched = []
+        for impl in candidates:
+            if not impl.pure:
+                arguments = impl.signature.bind(*args, **kwargs)
+                arguments.apply_defaults()
+                if impl.pattern.match(SimpleNamespace(**arguments.arguments)) is None:
+                    continue
+            matched.append(impl)
+        if len(matched) != 1:
+            self._fail(len(matched), args, kwargs)
+        return matched[0].func
+
+    def __call__(self, *args, **kwargs) -> T.Any:
+        return self.resolve(*args, **kwargs)(*args, **kwargs)
+
+    def __get__(self, instance: object, owner: type = None) -> T.Callable:
+        return self if instance is None else MethodType(self, instance)
+
+
+def overload(pattern: T.Union[ObjectPattern, dict]) -> T.Callable[[T.Callable], Overload]:
+    """Decorator creating an Overload with its first implementation.
+
+    Add more implementations with ``@name.register(pattern)``.
+    """
+    def decorator(func: T.Callable) -> Overload:
+        result = Overload(func.__name__)
+        functools.update_wrapper(result, func)
+        result.add(pattern, func)
+        return result
+    return decorator
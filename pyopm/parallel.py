@@ -0,0 +1,178 @@
+"""Match large batches of objects on all cores with a process pool.
+
+The patterns are shipped to every worker process exactly once, when the worker
+starts: either pickled (patterns built from declarative predicates, see
+pyopm.predicates) or as a ``'module:name'`` reference to an importable
+module-level pattern (or sequence of patterns), which also works for lambdas.
+The workers only send the bindings back; match objects are rebuilt in the
+parent process, which still has the objects and the patterns.
+
+Python 3.6 pools have no worker initializer: there, the patterns travel with
+every chunk and each worker sets them up once per ParallelMatcher.
+"""
+import os
+import sys
+import functools
+import importlib
+import itertools
+import collections
+import typing as T
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .core import ObjectPattern, ObjectMultiPattern
+
+PatternSpec = T.Union[ObjectPattern, T.Sequence[ObjectPattern], T.Text]
+
+_worker: T.Dict[T.Text, T.Any] = {}
+_POOL_INITIALIZER = sys.version_info >= (3, 7)  # initializer and mp_context arguments
+_tokens = itertools.count()
+
+
+def resolve_patterns(spec: PatternSpec) -> T.Union[ObjectPattern, T.Tuple[ObjectPattern, ...]]:
+    """Resolve a 'module:name' reference, turn sequences into tuples."""
+    if isinstance(spec, str):
+        module, _, name = spec.partition(':')
+        if not name:
+            raise ValueError(f'Expected a "module:name" reference, got {spec!r}')
+        spec = importlib.import_module(module)
+        for attr in name.split('.'):
+            spec = getattr(spec, attr)
+    if isinstance(spec, ObjectPattern):
+        return spec
+    return tuple(spec)
+
+
+def _init_worker(spec: PatternSpec, strategy: T.Text, match_args: dict) -> None:
+    patterns = resolve_patterns(spec)
+    _worker.update(patterns=patterns, strategy=strategy, match_args=match_args)
+    for p in (patterns,) if isinstance(patterns, ObjectPattern) else patterns:
+        p.compile(bindings_only=True)
+
+
+def _match_chunk(chunk: T.List[object]) -> T.List[T.Any]:
+    patterns, match_args = _worker['patterns'], _worker['match_args']
+    if isinstance(patterns, ObjectPattern):
+        return list(patterns.match_many(chunk, bindings_only=True, **match_args))
+    return list(ObjectMultiPattern.match_many(chunk, *patterns, strategy=_worker['strategy'],
+                                              bindings_only=True, **match_args))
+
+
+def _match_shipped_chunk(setup: T.Tuple[T.Any, ...], chunk: T.List[object]) -> T.List[T.Any]:
+    """_match_chunk for pools without initializer: setup is (token, *initargs)."""
+    token, *initargs = setup
+    if _worker.get('token') != token:
+        _init_worker(*initargs)
+        _worker['token'] = token
+    return _match_chunk(chunk)
+
+
+class ParallelMatcher:
+    """Match batches of objects against patterns in a ProcessPoolExecutor.
+
+    patterns is an ObjectPattern (results like ObjectPattern.match_many), a sequence
+    of them (results like ObjectMultiPattern.match_many) or a 'module:name'
+    reference to either. Use it as a context manager to shut the pool down.
+    """
+
+    def __init__(self, patterns: PatternSpec, max_workers: T.Optional[int] = None,
+                 chunksize: int = 1024, strategy: T.Text = 'all', mp_context: T.Any = None,
+                 **match_args):
+        if chunksize < 1:
+            raise ValueError(f'chunksize must be positive, got {chunksize!r}')
+        self.patterns = resolve_patterns(patterns)
+        self.chunksize, self.strategy = chunksize, strategy
+        # references are shipped as strings: the workers import the patterns themselves
+        shipped = patterns if isinstance(patterns, str) else self.patterns
+        initargs = (shipped, strategy, match_args)
+        if _POOL_INITIALIZER:
+            self.executor = ProcessPoolExecutor(max_workers, mp_context, initializer=_init_worker,
+                                                initargs=initargs)
+            self._task: T.Callable[[T.List[object]], T.List[T.Any]] = _match_chunk
+        else:
+            if mp_context is not None:
+                raise ValueError('mp_context requires Python 3.7+')
+            self.executor = ProcessPoolExecutor(max_workers)
+            self._task = functools.partial(_match_shipped_chunk, (next(_tokens), *initargs))
+        self.max_pending = 2 * (max_workers or os.cpu_count() or 1)
+
+    def __enter__(self) -> 'ParallelMatcher':
+        return self
+
+    def __exit__(self, exc_type, exc_value, trb) -> None:
+        self.shutdown()
+
+    def shutdown(self, wait_for_workers: bool = True) -> None:
+        """Shut the process pool down."""
+        self.executor.shutdown(wait_for_workers)
+
+    def _chunks(self, objects: T.Iterable[object]) -> T.Iterator[T.List[object]]:
+        it = iter(objects)
+        while True:
+            chunk = list(itertools.islice(it, self.chunksize))
+            if not chunk:
+                return
+            yield chunk
+
+    def _rebuild(self, obj: object, result: T.Any, bindings_only: bool) -> T.Any:
+        if bindings_only or result is None:
+            return result
+        if isinstance(self.patterns, ObjectPattern):
+            p = self.patterns
+            return p.match_type(obj, p, result, p.config)
+        i, bound = result
+        p = self.patterns[i]
+        return i, p.match_type(obj, p, bound, p.config)
+
+    def map(self, objects: T.Iterable[object], ordered: bool = True,
+            bindings_only: bool = False) -> T.Iterator[T.Any]:
+        """Lazily match all objects, yielding one result per object.
+
+        With ordered=False, results are yielded as soon as their chunk is done, as
+        (position in objects, result) pairs. At most a few chunks per worker are in
+        flight at any time, so memory stays bounded for unbounded inputs.
+        """
+        if ordered:
+            return self._map_ordered(objects, bindings_only)
+        return self._map_unordered(objects, bindings_only)
+
+    def _map_ordered(self, objects, bindings_only):
+        pending = collections.deque()
+
+        def drain():
+            chunk, future = pending.popleft()
+            return (self._rebuild(obj, result, bindings_only)
+                    for obj, result in zip(chunk, future.result()))
+
+        for chunk in self._chunks(objects):
+            pending.append((chunk, self.executor.submit(self._task, chunk)))
+            if len(pending) >= self.max_pending:
+                yield from drain()
+        while pending:
+            yield from drain()
+
+    def _map_unordered(self, objects, bindings_only):
+        pending, offset = {}, 0
+        chunks = self._chunks(objects)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < self.max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending[self.executor.submit(self._task, chunk)] = offset, chunk
+                offset += len(chunk)
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start, chunk = pending.pop(future)
+                for i, (obj, result) in enumerate(zip(chunk, future.result())):
+                    yield start + i, self._rebuild(obj, result, bindings_only)
+
+
+def parallel_match(objects: T.Iterable[object], patterns: PatternSpec, ordered: bool = True,
+                   bindings_only: bool = False, **kwargs) -> T.Iterator[T.Any]:
+    """Match objects with a temporary ParallelMatcher (see ParallelMatcher.map)."""
+    with ParallelMatcher(patterns, **kwargs) as matcher:
+        yield from matcher.map(objects, ordered, bindings_only)
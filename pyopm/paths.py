@@ -0,0 +1,439 @@
+"""Parse attribute paths into typed segments and compile them into accessor tries."""
+import ast
+import keyword
+import functools
+import itertools
+from operator import attrgetter, itemgetter, methodcaller
+import typing as T
+
+from .predicates import MISSING, Quantified
+from .diskcache import active, compile_cached
+
+
+SEG_ROOT, SEG_ATTR, SEG_ITEM, SEG_CALL, SEG_SLICE, SEG_EACH, SEG_EXPR = (
+    'root', 'attr', 'item', 'call', 'slice', 'each', 'expr')
+DYNAMIC = type('Dynamic', (), {'__repr__': lambda self: 'DYNAMIC', '__slots__': ()})()
+_LITERAL_ERRORS = (ValueError, TypeError, SyntaxError, MemoryError, RecursionError)
+_QUOTES = '\'"'
+_CLOSING = {'(': ')', '[': ']', '{': '}'}
+
+
+class Segment(T.NamedTuple):
+    """A typed segment of an attribute path.
+
+    value is the root or attribute name, the item key, the ``(args, kwargs)`` of a
+    call or the slice, if they are literals, or DYNAMIC if they have to be evaluated.
+    source is the exact text of the segment (``.a``, ``['b']``, ``(1)``, ``[:10]``).
+    """
+    kind: T.Text
+    value: T.Any
+    source: T.Text
+
+
+def _closing(path: T.Text, i: int) -> int:
+    """The index after the bracket matching ``path[i]`` (skipping strings), or -1."""
+    stack, n = [], len(path)
+    while i < n:
+        c = path[i]
+        if c in _QUOTES:
+            quote = c * 3 if path.startswith(c * 3, i) else c
+            i += len(quote)
+            while i < n and not path.startswith(quote, i):
+                i += 2 if path[i] == '\\' else 1
+            if i >= n:
+                return -1
+            i += len(quote)
+            continue
+        if c in _CLOSING:
+            stack.append(_CLOSING[c])
+        elif c in ')]}':
+            if not stack or stack.pop() != c:
+                return -1
+            if not stack:
+                return i + 1
+        i += 1
+    return -1
+
+
+def _subscript(source: T.Text) -> Segment:
+    if source[1:-1].strip() == '*':
+        return Segment(SEG_EACH, slice(None), source)
+    try:
+        node = ast.parse('_' + source, mode='eval').body.slice
+    except SyntaxError:
+        return Segment(SEG_ITEM, DYNAMIC, source)
+    node = getattr(node, 'value', node) if type(node).__name__ == 'Index' else node  # <= 3.8
+    if isinstance(node, ast.Slice):
+        try:
+            bounds = [None if b is None else ast.literal_eval(b)
+                      for b in (node.lower, node.upper, node.step)]
+        except _LITERAL_ERRORS:
+            return Segment(SEG_SLICE, DYNAMIC, source)
+        ok = all(b is None or isinstance(b, int) for b in bounds)
+        return Segment(SEG_SLICE, slice(*bounds) if ok else DYNAMIC, source)
+    try:
+        return Segment(SEG_ITEM, ast.literal_eval(node), source)
+    except _LITERAL_ERRORS:
+        return Segment(SEG_ITEM, DYNAMIC, source)
+
+
+def _call(source: T.Text) -> Segment:
+    try:
+        node = ast.parse('_' + source, mode='eval').body
+        if any(isinstance(a, ast.Starred) for a in node.args) or \
+                any(k.arg is None for k in node.keywords):
+            raise ValueError('unpacking')
+        value = (tuple(ast.literal_eval(a) for a in node.args),
+                 tuple((k.arg, ast.literal_eval(k.value)) for k in node.keywords))
+    except _LITERAL_ERRORS:
+        value = DYNAMIC
+    return Segment(SEG_CALL, value, source)
+
+
+def _encode_segments(segments: T.Tuple[Segment, ...]) -> tuple:
+    """Segments as a marshal-able tuple (for the CompileCache)."""
+    return tuple((kind, source, 1) if value is DYNAMIC
+                 else (kind, source, 2, value.start, value.stop, value.step)
+                 if isinstance(value, slice) else (kind, source, 0, value)
+                 for kind, value, source in segments)
+
+
+def _decode_segments(data: tuple) -> T.Tuple[Segment, ...]:
+    return tuple(Segment(kind, DYNAMIC if tag == 1 else slice(*rest) if tag == 2 else rest[0],
+                         source)
+                 for kind, source, tag, *rest in data)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_path(path: T.Text) -> T.Tuple[Segment, ...]:
+    """Parse an attribute path like ``obj.a['x.y'][1:3].f(2)`` into typed segments (cached).
+
+    Brackets are matched (strings are skipped), literal keys, slices and call
+    arguments are parsed with ``ast.literal_eval``. A path that does not start with
+    a name, or text that is not a segment, ends up in a SEG_EXPR segment.
+    """
+    cache = active()
+    if cache is None:
+        return _parse_path(path)
+    return _decode_segments(cache.get('segments', path,
+                                      lambda: _encode_segments(_parse_path(path))))
+
+
+def _parse_path(path: T.Text) -> T.Tuple[Segment, ...]:
+    n, i = len(path), 0
+    while i < n and (path[i] == '_' or path[i].isalnum()):
+        i += 1
+    if not path[:i].isidentifier():
+        return (Segment(SEG_EXPR, DYNAMIC, path),)
+    segments = [Segment(SEG_ROOT, path[:i], path[:i])]
+    while i < n:
+        c, start = path[i], i
+        if c == '.':
+            i += 1
+            while i < n and (path[i] == '_' or path[i].isalnum()):
+                i += 1
+            name = path[start + 1:i]
+            if name.isidentifier() and not keyword.iskeyword(name):
+                segments.append(Segment(SEG_ATTR, name, path[start:i]))
+                continue
+        elif c in '[(':
+            i = _closing(path, start)
+            if i > 0:
+                source = path[start:i]
+                segments.append(_subscript(source) if c == '[' else _call(source))
+                continue
+        segments.append(Segment(SEG_EXPR, DYNAMIC, path[start:]))
+        break
+    return tuple(segments)
+
+
+def break_attr_path(path: T.Text) -> T.Tuple[T.Text, ...]:
+    """Split an attribute path into parts: a segment and the calls following it."""
+    parts: T.List[T.Text] = []
+    for seg in parse_path(path):
+        if seg.kind == SEG_CALL or (seg.kind == SEG_EXPR and parts):
+            parts[-1] += seg.source
+        else:
+            parts.append(seg.source)
+    return tuple(parts)
+
+
+def _part_segments(part: T.Text) -> T.Tuple[Segment, ...]:
+    """The segments of a part (a bit of a path after the first one)."""
+    return parse_path('_' + part)[1:]
+
+
+def element_slice(part: T.Text) -> T.Optional[slice]:
+    """The slice selected by an element segment (``[*]``, ``[:10]``, ``[1::2]``), or None."""
+    segments = _part_segments(part)
+    if len(segments) == 1 and segments[0].kind in (SEG_EACH, SEG_SLICE) \
+            and segments[0].value is not DYNAMIC:
+        return segments[0].value
+    return None
+
+
+def _is_each(part: T.Any) -> bool:
+    segments = _part_segments(part) if isinstance(part, str) else ()
+    return len(segments) == 1 and segments[0].kind == SEG_EACH
+
+
+_SCALARS = (type(None), bool, int, float, complex, str, bytes, type(Ellipsis), slice)
+
+
+def _immutable(value: T.Any) -> bool:
+    """Whether a literal can be shared by all the calls of an accessor (no list, dict...)."""
+    if isinstance(value, (tuple, frozenset)):
+        return all(map(_immutable, value))
+    return isinstance(value, _SCALARS)
+
+
+def _literals(seg: Segment) -> T.Tuple[T.Any, ...]:
+    if seg.kind == SEG_CALL:
+        args, kwargs = seg.value
+        return (*args, *(v for _, v in kwargs))
+    return (seg.value,) if seg.kind in (SEG_ITEM, SEG_SLICE) else ()
+
+
+def _apply(args: T.Tuple[T.Any, ...], kwargs: T.Tuple[T.Tuple[T.Text, T.Any], ...]
+           ) -> T.Callable[[T.Callable], T.Any]:
+    kw = dict(kwargs)
+    return lambda f: f(*args, **kw)
+
+
+def _chain(funcs: T.Sequence[T.Callable[[T.Any], T.Any]]) -> T.Callable[[T.Any], T.Any]:
+    if len(funcs) == 1:
+        return funcs[0]
+
+    def chain(o):
+        for f in funcs:
+            o = f(o)
+        return o
+    return chain
+
+
+def part_accessor(part: T.Text) -> T.Optional[T.Callable[[T.Any], T.Any]]:
+    """A fast accessor (no eval) for a part, or None if it has to be evaluated.
+
+    Attributes and literal items and slices become attrgetter/itemgetter, method
+    calls with literal arguments methodcaller. The literals are shared by every
+    call, so mutable ones (like ``obj.get('x', [])``) are evaluated every time.
+    """
+    segments = _part_segments(part)
+    if not segments or any(seg.value is DYNAMIC or not all(map(_immutable, _literals(seg)))
+                           for seg in segments):
+        return None
+    first, calls = segments[0], segments[1:]
+    if first.kind == SEG_ATTR:
+        if len(calls) == 1:
+            args, kwargs = calls[0].value
+            return methodcaller(first.value, *args, **dict(kwargs))
+        funcs = [attrgetter(first.value)]
+    elif first.kind in (SEG_ITEM, SEG_SLICE):
+        funcs = [itemgetter(first.value)]
+    else:
+        return None
+    return _chain(funcs + [_apply(*c.value) for c in calls])
+
+
+def _join(parts: T.Iterable[T.Any]) -> T.Text:
+    return ''.join(''.join(p) if isinstance(p, tuple) else p for p in parts)
+
+
+def key_path(key: T.Text, spec: T.Mapping[T.Text, T.Any]
+             ) -> T.Tuple[T.Tuple[T.Any, ...], T.Tuple[T.Callable, ...]]:
+    """The path bits of a pattern key and the tests to run on the value it resolves to.
+
+    Keys containing ``[*]`` or whose spec has a ``'quantifier'`` are element paths:
+    everything from their first element segment (``[*]`` or a slice) on is grouped
+    into one tuple bit, which resolves to a lazy Elements view, and the tests are
+    applied to every element by a Quantified predicate. Slices of other keys keep
+    selecting a (sliced) value. A quantifier on a key without element segment
+    raises a ValueError.
+    """
+    parts, tests = break_attr_path(key), tuple(spec.get('eval', ()))
+    if 'quantifier' not in spec and not any(map(_is_each, parts[1:])):
+        return parts, tests
+    quantified = Quantified(tests, spec.get('quantifier', 'all'))  # checks the quantifier
+    for i, part in enumerate(parts[1:], 1):
+        if element_slice(part) is not None:
+            return parts[:i] + (parts[i:],), (quantified,)
+    raise ValueError(f'{key!r} has a quantifier, but no element segment ([*] or a slice)')
+
+
+def _element_step(part: T.Text) -> T.Tuple[bool, T.Any]:
+    """(is a slice, slice or accessor) for a bit of an element path."""
+    s = element_slice(part)
+    if s is not None:
+        return True, s
+    accessor = part_accessor(part)
+    if accessor is not None:
+        return False, accessor
+    code = compile_cached('_e' + part, '<pyopm>', 'eval')
+    return False, lambda e: eval(code, {}, {'_e': e})  # pylint: disable=eval-used
+
+
+def _slice(iterable: T.Iterable[T.Any], s: slice) -> T.Iterator[T.Any]:
+    if s.start is None and s.stop is None and s.step is None:
+        return iter(iterable)
+    if all(x is None or x >= 0 for x in (s.start, s.stop)) and (s.step or 1) > 0:
+        return itertools.islice(iterable, s.start, s.stop, s.step)
+    try:  # negative bounds need the length
+        return iter(iterable[s])
+    except TypeError:
+        return iter(list(iterable)[s])
+
+
+class Elements:
+    """A lazy, re-iterable view of the elements an element path selects in a collection.
+
+    Iterating yields the elements whose path could be resolved; nothing is
+    materialized, so it works for huge collections and for iterators (once).
+    """
+    __slots__ = ('collection', 'steps')
+
+    def __init__(self, collection: T.Any, steps: T.Tuple[T.Tuple[bool, T.Any], ...]):
+        self.collection, self.steps = collection, steps
+
+    def __repr__(self) -> T.Text:
+        return f'<Elements of {type(self.collection).__name__}/>'
+
+    def __iter__(self) -> T.Iterator[T.Any]:
+        return (e for e in self.resolved() if e is not MISSING)
+
+    def resolved(self) -> T.Iterator[T.Any]:
+        """Yield every selected element, MISSING for the ones that could not be resolved."""
+        return self._walk(self.collection, 0)
+
+    def _walk(self, value: T.Any, start: int) -> T.Iterator[T.Any]:
+        steps = self.steps
+        try:
+            elements = _slice(value, steps[start][1])
+        except TypeError:  # not iterable
+            yield MISSING
+            return
+        for e in elements:
+            for i in range(start + 1, len(steps)):
+                is_slice, step = steps[i]
+                if is_slice:
+                    yield from self._walk(e, i)
+                    break
+                try:
+                    e = step(e)
+                except Exception:  # pylint: disable=broad-except
+                    yield MISSING
+                    break
+            else:
+                yield e
+
+
+class ElementsAccessor:
+    """The accessor of a grouped element path bit: collection -> Elements."""
+    __slots__ = ('steps',)
+
+    def __init__(self, parts: T.Tuple[T.Text, ...]):
+        self.steps = tuple(map(_element_step, parts))
+
+    def __call__(self, collection: T.Any) -> Elements:
+        return Elements(collection, self.steps)
+
+
+STEP_ROOT, STEP_GET, STEP_EVAL, STEP_ERROR = range(4)
+
+
+def compile_step(parts: T.Tuple[T.Any, ...], index: int) -> T.Tuple[int, T.Any, T.Text]:
+    """Compile the step resolving ``parts[:index + 1]`` from the value of ``parts[:index]``.
+
+    Returns a ``(kind, accessor, source)`` tuple. Attributes, literal items and
+    slices and method calls with literal arguments become fast accessors (see
+    part_accessor), grouped element paths (see key_path) an ElementsAccessor,
+    anything else is compiled once into a code object that is evaluated like the
+    joined expression. The steps are cached per path prefix.
+    """
+    return _compile_step(tuple(parts[:index + 1]))
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_step(parts: T.Tuple[T.Any, ...]) -> T.Tuple[int, T.Any, T.Text]:
+    source, part, index = _join(parts), parts[-1], len(parts) - 1
+    if isinstance(part, tuple):
+        try:
+            return STEP_GET, ElementsAccessor(part), source
+        except SyntaxError as e:
+            return STEP_ERROR, e, source
+    if index == 0 and part == 'obj':
+        return STEP_ROOT, None, source
+    if index:
+        accessor = part_accessor(part)
+        if accessor is not None:
+            return STEP_GET, accessor, source
+    try:
+        return STEP_EVAL, compile_cached(source, '<pyopm>', 'eval'), source
+    except SyntaxError as e:
+        return STEP_ERROR, e, source
+
+
+def compile_accessors(parts: T.Tuple[T.Text, ...]) -> T.Tuple[T.Tuple[int, T.Any, T.Text], ...]:
+    """Compile every prefix of an attribute path into an accessor step."""
+    return tuple(compile_step(parts, i) for i in range(len(parts)))
+
+
+class PathNode:
+    """A node of a path trie: one accessor step plus the keys that end here."""
+    __slots__ = ('path', 'kind', 'accessor', 'source', 'children', 'keys', '_index')
+
+    def __init__(self, path: T.Tuple[T.Text, ...]):
+        self.path = path
+        self.kind, self.accessor, self.source = compile_step(path, len(path) - 1)
+        self.children: T.List['PathNode'] = []
+        self.keys: T.List[T.Any] = []  # payloads of the keys ending at this node
+        self._index: T.Dict[T.Text, 'PathNode'] = {}
+
+    def __repr__(self) -> T.Text:
+        return f'<PathNode {self.source!r} keys={len(self.keys)} children={len(self.children)}/>'
+
+    def child(self, part: T.Text) -> 'PathNode':
+        """Get or create the child node for the path bit part."""
+        node = self._index.get(part)
+        if node is None:
+            node = self._index[part] = PathNode(self.path + (part,))
+            self.children.append(node)
+        return node
+
+    def walk(self) -> T.Iterator['PathNode']:
+        """Iterate over this node and all its descendants (depth first)."""
+        yield self
+        for c in self.children:
+            yield from c.walk()
+
+
+def build_path_trie(items: T.Iterable[T.Tuple[T.Tuple[T.Text, ...], T.Any]]) -> T.List[PathNode]:
+    """Merge (path bits, payload) pairs into a trie, return its top level nodes.
+
+    Shared prefixes end up in the same node, so they are resolved only once.
+    Children keep the order in which their first key was inserted.
+    """
+    top = PathNode.__new__(PathNode)
+    top.path, top.children, top._index = (), [], {}  # pylint: disable=protected-access
+    for kt, payload in items:
+        node = top
+        for part in kt:
+            node = node.child(part)
+        node.keys.append(payload)
+    return top.children
+
+
+def resolve_accessors(steps: T.Sequence[T.Tuple[int, T.Any, T.Text]], obj: object,
+                      eval_globals: dict = None, eval_locals: dict = None) -> T.Any:
+    """Resolve a compiled accessor chain for obj. Errors are propagated."""
+    extra_locals = eval_locals if isinstance(eval_locals, dict) else {}
+    o = None
+    for kind, accessor, _ in steps:
+        if kind == STEP_GET:
+            o = accessor(o)
+        elif kind == STEP_ROOT:
+            o = extra_locals.get('obj', obj)
+        elif kind == STEP_EVAL:
+            o = eval(accessor, eval_globals, {'obj': obj, **extra_locals})
+        else:
+            raise accessor
+    return o
@@ -0,0 +1,243 @@
+"""Declarative predicates that can be used in the 'eval' lists of ObjectPatterns.
+
+Unlike lambdas, these objects can be inspected by the matching engine: they are
+hashable and comparable (identical tests are merged), picklable, and they know
+their relative cost (cheap tests run first). Plain callables keep working and
+can be mixed with them freely.
+"""
+import re
+import typing as T
+
+DEFAULT_COST = 10  # cost of an opaque callable; every Predicate is cheaper
+
+
+class Predicate:
+    """Base class for declarative predicates."""
+    __slots__ = ()
+    _fields: T.Tuple[T.Text, ...] = ()
+    cost = 1
+
+    def __call__(self, o: object) -> bool:
+        raise NotImplementedError
+
+    def _key(self) -> T.Tuple:
+        return tuple(getattr(self, k) for k in self._fields)
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and self._key() == other._key()
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    def __hash__(self) -> int:
+        return hash((type(self), self._key()))
+
+    def __repr__(self) -> T.Text:
+        return f'{type(self).__name__}({", ".join(map(repr, self._key()))})'
+
+    def __getstate__(self) -> T.Tuple:
+        return self._key()
+
+    def __setstate__(self, state: T.Tuple) -> None:
+        self.__init__(*state)  # pylint: disable=unnecessary-dunder-call
+
+
+class IsInstance(Predicate):
+    """``isinstance(o, types)``."""
+    __slots__ = ('types',)
+    _fields = ('types',)
+    cost = 0
+
+    def __init__(self, *types: type):
+        if len(types) == 1 and isinstance(types[0], tuple):
+            types = types[0]
+        self.types = types
+
+    def __call__(self, o: object) -> bool:
+        return isinstance(o, self.types)
+
+    def __repr__(self) -> T.Text:
+        return f'IsInstance({", ".join(t.__qualname__ for t in self.types)})'
+
+
+class Eq(Predicate):
+    """``o == value``."""
+    __slots__ = ('value',)
+    _fields = ('value',)
+
+    def __init__(self, value: T.Any):
+        self.value = value
+
+    def __call__(self, o: object) -> bool:
+        return o == self.value
+
+
+class In(Predicate):
+    """``o in values``."""
+    __slots__ = ('values',)
+    _fields = ('values',)
+
+    def __init__(self, values: T.Iterable[T.Any]):
+        values = tuple(values)
+        try:
+            self.values = frozenset(values)
+        except TypeError:
+            self.values = values
+
+    def __call__(self, o: object) -> bool:
+        try:
+            return o in self.values
+        except TypeError:  # unhashable o
+            return o in tuple(self.values)
+
+    def __getstate__(self) -> T.Tuple:
+        return (tuple(self.values),)
+
+
+class Range(Predicate):
+    """``low <= o < high``, None means unbounded (like range, high is excluded)."""
+    __slots__ = ('low', 'high')
+    _fields = ('low', 'high')
+    cost = 2
+
+    def __init__(self, low: T.Any = None, high: T.Any = None):
+        self.low, self.high = low, high
+
+    def __call__(self, o: object) -> bool:
+        try:
+            return ((self.low is None or self.low <= o)
+                    and (self.high is None or o < self.high))
+        except TypeError:  # not comparable
+            return False
+
+
+class Regex(Predicate):
+    """``re.search(pattern, o, flags)``, objects that are no strings never match."""
+    __slots__ = ('pattern', 'flags', '_regex')
+    _fields = ('pattern', 'flags')
+    cost = 5
+
+    def __init__(self, pattern: T.Union[T.Text, bytes], flags: int = 0):
+        self.pattern, self.flags = pattern, int(flags)
+        self._regex = re.compile(pattern, flags)
+
+    def __call__(self, o: object) -> bool:
+        if not isinstance(o, (str, bytes)):
+            return False
+        try:
+            return self._regex.search(o) is not None
+        except TypeError:  # str pattern vs bytes or vice versa
+            return False
+
+
+class Len(Predicate):
+    """``len(o) == n`` or ``predicate(len(o))``, objects without a length never match."""
+    __slots__ = ('test',)
+    _fields = ('test',)
+    cost = 2
+
+    def __init__(self, test: T.Union[int, T.Callable[[int], bool]]):
+        self.test = test
+
+    def __call__(self, o: object) -> bool:
+        try:
+            n = len(o)
+        except TypeError:
+            return False
+        return self.test(n) if callable(self.test) else n == self.test
+
+
+class All(Predicate):
+    """All of the predicates are true (evaluated in order, short circuiting)."""
+    __slots__ = ('predicates',)
+    _fields = ('predicates',)
+
+    def __init__(self, *predicates: T.Callable[[T.Any], bool]):
+        self.predicates = predicates
+
+    @property
+    def cost(self) -> int:  # pylint: disable=invalid-overridden-method
+        return sum(test_cost(p) for p in self.predicates)
+
+    def __call__(self, o: object) -> bool:
+        return all(p(o) for p in self.predicates)
+
+    def __repr__(self) -> T.Text:
+        return f'{type(self).__name__}({", ".join(map(repr, self.predicates))})'
+
+    def __getstate__(self) -> T.Tuple:
+        return self.predicates
+
+
+class Any(All):
+    """Any of the predicates is true (evaluated in order, short circuiting)."""
+    __slots__ = ()
+
+    def __call__(self, o: object) -> bool:
+        return any(p(o) for p in self.predicates)
+
+
+MISSING = object()  # an element whose path could not be resolved (see Quantified)
+
+
+class Quantified(Predicate):
+    """Apply tests to the elements of an iterable with a quantifier.
+
+    quantifier is ``'all'`` (the default), ``'any'`` or a predicate on the number of
+    elements passing all the tests (like ``Range(1, 4)``). The elements are consumed
+    lazily: ``'all'`` stops at the first failing element, ``'any'`` at the first
+    passing one. Elements of an element path that could not be resolved fail.
+    """
+    __slots__ = ('tests', 'quantifier')
+    _fields = ('tests', 'quantifier')
+    cost = DEFAULT_COST  # iterates: never cheaper than an opaque callable
+
+    def __init__(self, tests: T.Sequence[T.Callable[[T.Any], bool]],
+                 quantifier: T.Union[T.Text, T.Callable[[int], bool]] = 'all'):
+        if not (quantifier in ('all', 'any') or callable(quantifier)):
+            raise ValueError(f"quantifier must be 'all', 'any' or a callable, "
+                             f"got {quantifier!r}")
+        self.tests, self.quantifier = tuple(tests), quantifier
+
+    def __call__(self, o: T.Iterable[T.Any]) -> bool:
+        resolved = getattr(o, 'resolved', None)
+        elements = resolved() if resolved is not None else iter(o)
+        tests, quantifier = self.tests, self.quantifier
+        if quantifier == 'all':
+            for e in elements:
+                if e is MISSING or not all(t(e) for t in tests):
+                    return False
+            return True
+        if quantifier == 'any':
+            for e in elements:
+                if e is not MISSING and all(t(e) for t in tests):
+                    return True
+            return False
+        return bool(quantifier(sum(1 for e in elements
+                                   if e is not MISSING and all(t(e) for t in tests))))
+
+
+def test_cost(test: T.Callable) -> int:
+    """The relative cost of running test."""
+    return test.cost if isinstance(test, Predicate) else DEFAULT_COST
+
+
+def predicate_key(test: T.Callable) -> T.Any:
+    """Key used to merge identical tests (equal predicates, identical callables)."""
+    try:
+        hash(test)
+    except TypeError:
+        return ('id', id(test))
+    return ('eq', test)
+
+
+def order_tests(tests: T.Iterable[T.Callable]) -> T.Tuple[T.Callable, ...]:
+    """Remove duplicate tests and move the cheap declarative ones to the front.
+
+    The sort is stable and opaque callables are the most expensive tests, so their
+    relative order is never changed.
+    """
+    unique = {}
+    for t in tests:
+        unique.setdefault(predicate_key(t), t)
+    return tuple(sorted(unique.values(), key=test_cost))
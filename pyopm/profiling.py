@@ -0,0 +1,204 @@
+"""Per-rule profiling and tracing of pattern matching.
+
+A MatchProfiler attached to an ObjectPattern (``profiler=`` or ``pattern.profiler``)
+or passed to an ObjectMultiPattern collects counters and cumulative times per
+path resolution, per ``'eval'`` test and per bind, the rule that rejected each
+object and how often every pattern matches and wins. Patterns without a profiler
+only pay for a single ``is None`` check per match.
+
+Profiled matches compute their bindings eagerly (so that binds can be timed) and
+bypass compiled matchers, match caches and the shared network of the ``'all'``
+strategy: expect them to be slower than unprofiled ones.
+"""
+import time
+import typing as T
+from warnings import warn
+
+from .paths import PathNode, STEP_ROOT, STEP_GET, STEP_EVAL
+from .predicates import Predicate
+
+
+def _test_name(test: T.Callable[[T.Any], T.Any]) -> T.Text:
+    if isinstance(test, Predicate):
+        return repr(test)
+    return getattr(test, '__qualname__', None) or repr(test)
+
+
+def _label(pattern: T.Any) -> T.Text:
+    return f'{type(pattern).__name__}@{id(pattern):#x}'
+
+
+class MatchProfiler:
+    """Collect matching statistics, export them with as_dict or stream them to a callback.
+
+    callback is called with an event dict after every profiled match
+    (``{'event': 'match' | 'reject', 'pattern': label, 'rule': ..., 'time': ...}``)
+    and for every win of a multi pattern (``{'event': 'win', 'pattern': label}``).
+    label maps patterns to the names used in the exported data.
+    """
+
+    def __init__(self, callback: T.Optional[T.Callable[[dict], T.Any]] = None,
+                 label: T.Callable[[T.Any], T.Text] = _label):
+        self.callback, self.label = callback, label
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all the collected data."""
+        # pylint: disable=attribute-defined-outside-init
+        self.patterns: T.Dict[T.Text, T.Dict[T.Text, T.Any]] = {}
+        self.paths: T.Dict[T.Text, T.List[float]] = {}  # [count, failures, time]
+        self.tests: T.Dict[T.Text, T.List[float]] = {}  # [calls, rejections, errors, time]
+        self.binds: T.Dict[T.Text, T.List[float]] = {}  # [count, time]
+
+    def __repr__(self) -> T.Text:
+        return f'<MatchProfiler patterns={len(self.patterns)} paths={len(self.paths)}/>'
+
+    def _pattern(self, pattern: T.Any) -> T.Dict[T.Text, T.Any]:
+        label = self.label(pattern)
+        stats = self.patterns.get(label)
+        if stats is None:
+            stats = self.patterns[label] = {'label': label, 'attempts': 0, 'matches': 0,
+                                            'wins': 0, 'time': 0.0, 'rejections': {}}
+        return stats
+
+    def _finish(self, pattern: T.Any, start: float, rule: T.Optional[T.Text]) -> None:
+        elapsed = time.perf_counter() - start
+        stats = self._pattern(pattern)
+        stats['attempts'] += 1
+        stats['time'] += elapsed
+        if rule is None:
+            stats['matches'] += 1
+        else:
+            stats['rejections'][rule] = stats['rejections'].get(rule, 0) + 1
+        if self.callback is not None:
+            self.callback({'event': 'reject' if rule else 'match', 'pattern': stats['label'],
+                           'rule': rule, 'time': elapsed})
+
+    def record_win(self, pattern: T.Any) -> None:
+        """Count a win of pattern (its match was picked by a multi pattern)."""
+        stats = self._pattern(pattern)
+        stats['wins'] += 1
+        if self.callback is not None:
+            self.callback({'event': 'win', 'pattern': stats['label']})
+
+    def as_dict(self) -> T.Dict[T.Text, T.Any]:
+        """All the collected data as plain (JSON serializable) dicts."""
+        return {
+            'patterns': {k: {**v, 'rejections': dict(v['rejections'])}
+                         for k, v in self.patterns.items()},
+            'paths': {k: {'count': c, 'failures': f, 'time': t}
+                      for k, (c, f, t) in self.paths.items()},
+            'tests': {k: {'calls': c, 'rejections': r, 'errors': e, 'time': t}
+                      for k, (c, r, e, t) in self.tests.items()},
+            'binds': {k: {'count': c, 'time': t} for k, (c, t) in self.binds.items()},
+        }
+
+    def _path_stats(self, node: PathNode) -> T.List[float]:
+        """The [count, failures, time] counters of the resolution of node."""
+        stats = self.paths.get(node.source)
+        if stats is None:
+            stats = self.paths[node.source] = [0, 0, 0.0]
+        return stats
+
+    def _test_stats(self, node: PathNode, test: T.Any, name: T.Text) -> T.List[float]:
+        """The [calls, rejections, errors, time] counters of test at node."""
+        # pylint: disable=unused-argument
+        stats = self.tests.get(name)
+        if stats is None:
+            stats = self.tests[name] = [0, 0, 0, 0.0]
+        return stats
+
+    def match(self, pattern: T.Any, obj: object, eval_globals: dict = None,
+              eval_locals: dict = None) -> T.Any:
+        """Apply pattern to obj (like ``pattern.match``) and record what happens."""
+        # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+        clock, start = time.perf_counter, time.perf_counter()
+        verbose = pattern.verbose
+        extra_locals = eval_locals if isinstance(eval_locals, dict) else {}
+        root = extra_locals.get('obj', obj)
+        eval_locals = None
+        values = [None] * len(pattern.pattern)
+
+        stack = [(node, None) for node in reversed(pattern.compiled_pattern)]
+        while stack:
+            node, o = stack.pop()
+            kind = node.kind
+            path = self._path_stats(node)
+            t0 = clock()
+            try:
+                if kind == STEP_GET:
+                    o = node.accessor(o)
+                elif kind == STEP_ROOT:
+                    o = root
+                elif kind == STEP_EVAL:
+                    if eval_locals is None:
+                        eval_locals = {'obj': obj, **extra_locals}
+                    o = eval(node.accessor, eval_globals, eval_locals)
+                else:
+                    raise node.accessor
+            except Exception as e:
+                path[0] += 1
+                path[1] += 1
+                path[2] += clock() - t0
+                if verbose:
+                    warn(f'Missing attribute? {node.source!r}, {e}')
+                self._finish(pattern, start, f'{node.source}: missing')
+                return None
+            path[0] += 1
+            path[2] += clock() - t0
+            for index, tests in node.keys:
+                for test_func in tests:
+                    name = f'{node.source}: {_test_name(test_func)}'
+                    stats = self._test_stats(node, test_func, name)
+                    stats[0] += 1
+                    t0 = clock()
+                    try:
+                        ok = bool(test_func(o))
+                    except Exception as e:
+                        stats[2] += 1
+                        stats[3] += clock() - t0
+                        warn(f'Error running {test_func!r} ({node.path!r}: {o!r}): {e}')
+                        self._finish(pattern, start, f'{name} (error)')
+                        return None
+                    stats[3] += clock() - t0
+                    if not ok:
+                        stats[1] += 1
+                        if verbose:
+                            warn(f'Test failed: {test_func!r} ({node.path!r}: {o!r})')
+                        self._finish(pattern, start, name)
+                        return None
+                values[index] = o
+            if node.children:
+                stack.extend((c, o) for c in reversed(node.children))
+
+        bound = self._bind(pattern, obj, values, eval_globals, extra_locals, eval_locals)
+        self._finish(pattern, start, None)
+        return pattern.match_type(obj, pattern, bound, pattern.config)
+
+    def _bind(self, pattern: T.Any, obj: object, values: T.Sequence[T.Any],
+              eval_globals: T.Optional[dict], extra_locals: dict,
+              eval_locals: T.Optional[dict]) -> dict:
+        """Compute the bindings eagerly (like ObjectPattern._make_bound), timing each one."""
+        # pylint: disable=protected-access,too-many-arguments
+        clock, bound = time.perf_counter, {}
+        for index, binds in pattern._bind_plan:
+            o = values[index]
+            for var_name, var_eval in binds:
+                if pattern.verbose and var_name in bound:
+                    warn(f'Overwriting binding for {var_name!r}')
+                t0 = clock()
+                if callable(var_eval):
+                    bound[var_name] = var_eval(o)
+                elif isinstance(var_eval, str):
+                    if eval_locals is None:
+                        eval_locals = {'obj': obj, **extra_locals}
+                    bound[var_name] = eval(pattern._compiled_binds[var_eval], eval_globals,
+                                           {**eval_locals, 'o': o})
+                else:
+                    bound[var_name] = o
+                stats = self.binds.get(var_name)
+                if stats is None:
+                    stats = self.binds[var_name] = [0, 0.0]
+                stats[0] += 1
+                stats[1] += clock() - t0
+        return bound
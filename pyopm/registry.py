@@ -0,0 +1,152 @@
+"""A mutable registry of ObjectPatterns with hash indexes on equality constraints.
+
+Most patterns of a large rule set pin some discriminator path to a literal
+(``'obj.event_type': {'eval': [Eq('X')]}``). The registry indexes each pattern
+under one such path, so matching an object resolves the path once, does one
+dict lookup and only runs the few candidate patterns.
+"""
+import typing as T
+
+from .core import ObjectPattern, ObjectPatternMatch
+from .paths import key_path, compile_accessors, resolve_accessors
+from .predicates import Eq, In
+
+
+def equality_constraints(pattern: ObjectPattern
+                         ) -> T.List[T.Tuple[T.Tuple[T.Text, ...], T.FrozenSet[T.Any]]]:
+    """(path bits, allowed values) of the indexable Eq/In tests of a pattern."""
+    result = []
+    for k, v in pattern.pattern.items():
+        path, tests = key_path(k, v)
+        for test in tests:
+            cls = type(test)
+            if cls is Eq:
+                values = (test.value,)
+            elif cls is In and isinstance(test.values, frozenset):
+                values = test.values
+            else:
+                continue
+            try:
+                if all(x == x for x in values):  # NaN & co would never match
+                    result.append((path, frozenset(values)))
+                    break
+            except TypeError:  # unhashable
+                pass
+    return result
+
+
+class PatternRegistry:
+    """A collection of patterns that dispatches objects through equality indexes.
+
+    Patterns without an indexable equality constraint are tried for every object.
+    Adding and removing patterns updates the indexes incrementally.
+    """
+
+    def __init__(self, patterns: T.Iterable[ObjectPattern] = ()):
+        self._order: T.Dict[ObjectPattern, int] = {}  # pattern -> registration number
+        self._counter = 0
+        self._where: T.Dict[ObjectPattern, T.Optional[T.Tuple]] = {}  # pattern -> (path, values)
+        self._indexes: T.Dict[T.Tuple[T.Text, ...], T.Dict[T.Any, T.Dict[ObjectPattern, None]]] = {}
+        self._sizes: T.Dict[T.Tuple[T.Text, ...], int] = {}
+        self._accessors: T.Dict[T.Tuple[T.Text, ...], T.Tuple] = {}
+        self._generic: T.Dict[ObjectPattern, None] = {}
+        for p in patterns:
+            self.add(p)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self) -> T.Iterator[ObjectPattern]:
+        return iter(self._order)
+
+    def __contains__(self, pattern: object) -> bool:
+        return pattern in self._order
+
+    def __repr__(self) -> T.Text:
+        return (f'<PatternRegistry patterns={len(self)} indexes={len(self._indexes)} '
+                f'unindexed={len(self._generic)}/>')
+
+    @property
+    def indexed_paths(self) -> T.Dict[T.Text, int]:
+        """The indexed paths and the number of patterns indexed by each of them."""
+        return {''.join(path): n for path, n in self._sizes.items()}
+
+    def add(self, pattern: ObjectPattern) -> ObjectPattern:
+        """Register a pattern (again: no-op). Returns the pattern, usable as a decorator."""
+        if pattern in self._order:
+            return pattern
+        self._order[pattern] = self._counter
+        self._counter += 1
+        constraints = equality_constraints(pattern)
+        if not constraints:
+            self._where[pattern] = None
+            self._generic[pattern] = None
+            return pattern
+        # prefer the path that already indexes the most patterns
+        path, values = max(constraints, key=lambda c: self._sizes.get(c[0], 0))
+        self._where[pattern] = path, values
+        if path not in self._indexes:
+            self._indexes[path], self._sizes[path] = {}, 0
+            self._accessors[path] = compile_accessors(path)
+        index = self._indexes[path]
+        for value in values:
+            index.setdefault(value, {})[pattern] = None
+        self._sizes[path] += 1
+        return pattern
+
+    def remove(self, pattern: ObjectPattern) -> None:
+        """Unregister a pattern, raises KeyError if it is not registered."""
+        del self._order[pattern]
+        where = self._where.pop(pattern)
+        if where is None:
+            del self._generic[pattern]
+            return
+        path, values = where
+        index = self._indexes[path]
+        for value in values:
+            bucket = index[value]
+            del bucket[pattern]
+            if not bucket:
+                del index[value]
+        self._sizes[path] -= 1
+        if not self._sizes[path]:
+            del self._indexes[path], self._sizes[path], self._accessors[path]
+
+    def discard(self, pattern: ObjectPattern) -> None:
+        """Unregister a pattern if it is registered."""
+        if pattern in self._order:
+            self.remove(pattern)
+
+    def candidates(self, obj: object, eval_globals: dict = None,
+                   eval_locals: dict = None) -> T.List[ObjectPattern]:
+        """The patterns that can possibly match obj, in registration order."""
+        found = list(self._generic)
+        for path, index in self._indexes.items():
+            try:
+                value = resolve_accessors(self._accessors[path], obj, eval_globals, eval_locals)
+            except Exception:  # pylint: disable=broad-except
+                continue  # every pattern of this index needs the path
+            try:
+                bucket = index.get(value)
+            except TypeError:  # unhashable value: fall back to comparing
+                found.extend(p for v, b in index.items() if v == value for p in b)
+                continue
+            if bucket:
+                found.extend(bucket)
+        if len(found) > 1:
+            order = self._order
+            found = sorted(set(found), key=order.__getitem__)
+        return found
+
+    def match(self, obj: object, **match_args) -> T.List[ObjectPatternMatch]:
+        """All successful matches of obj, in registration order."""
+        return [m for m in (p.match(obj, **match_args)
+                            for p in self.candidates(obj, **match_args)) if m is not None]
+
+    def first_match(self, obj: object, **match_args) -> T.Optional[ObjectPatternMatch]:
+        """The first successful match of obj (in registration order) or None."""
+        for p in self.candidates(obj, **match_args):
+            m = p.match(obj, **match_args)
+            if m is not None:
+                return m
+        return None
@@ -49,4 +49,7 @@ setuptools.setup(
         'Programming Language :: Python :: Implementation :: PyPy',
     ],
     python_requires='>=3.6',
+    extras_require={
+        'columnar': ['numpy'],  # pyopm.columnar
+    },
 )
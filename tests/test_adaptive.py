@@ -0,0 +1,43 @@
+# pylint: disable=undefined-variable
+import pytest
+
+from pyopm.core import ObjectPattern
+from pyopm.adaptive import AdaptiveOrder
+
+
+class Obj:
+    # pylint: disable=too-few-public-methods,missing-class-docstring
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def test_adaptive_order():
+    calls = []
+
+    def expensive(o):
+        calls.append(o)
+        return sum(range(1000)) > 0
+
+    def positive(o):
+        return o > 0
+
+    p = ObjectPattern({'obj.a': {'eval': [expensive], 'bind': {'a': None}},
+                       'obj.b': {'eval': [expensive, positive], 'bind': {'b': None}}})
+    adaptive = p.adapt(interval=10)
+    assert p.profiler is adaptive and adaptive.key_order() == ['obj.a', 'obj.b']
+    for i in range(10):
+        assert p.match(Obj(a=i, b=-1)) is None
+    assert adaptive.reorders == 1 and adaptive.key_order() == ['obj.b', 'obj.a']
+    (_, tests), = p.compiled_pattern[0].children[0].keys
+    assert tests == (positive, expensive)
+    del calls[:]
+    assert p.match(Obj(a=1, b=-1)) is None and calls == []
+    assert p.match(Obj(a=1, b=2)).bound == {'a': 1, 'b': 2}
+    assert adaptive.as_dict()['patterns'][adaptive.label(p)]['attempts'] == 12
+    adaptive.freeze()
+    assert p.profiler is None and adaptive.frozen and adaptive.reorders == 2
+    del calls[:]
+    assert p.compile()(Obj(a=1, b=-1)) is None and calls == []
+    assert p.compile()(Obj(a=3, b=4)).bound == {'a': 3, 'b': 4}
+    with pytest.raises(ValueError):
+        AdaptiveOrder(p, interval=0)
@@ -0,0 +1,90 @@
+# pylint: disable=undefined-variable
+import asyncio
+
+import pytest
+
+from pyopm.core import (ObjectPattern, AsyncObjectMultiPattern, NoMatchingPatternError,
+                        AmbiguityError)
+from pyopm.predicates import IsInstance
+
+
+def run(coro):
+    """asyncio.run, which python 3.6 lacks."""
+    if hasattr(asyncio, 'run'):
+        return asyncio.run(coro)
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_amatch_concurrency_and_cancellation():
+    running, peak, cancelled = [0], [0], []
+
+    async def slow_positive(o):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        try:
+            await asyncio.sleep(0.01 if o < 100 else 10)
+            return o > 0
+        except asyncio.CancelledError:
+            cancelled.append(o)
+            raise
+        finally:
+            running[0] -= 1
+
+    async def double(o):
+        await asyncio.sleep(0)
+        return 2 * o
+
+    p = ObjectPattern({'obj': {'eval': [IsInstance(tuple)]},
+                       **{f'obj[{i}]': {'eval': [slow_positive], 'bind': {f'x{i}': double}}
+                          for i in range(4)}})
+    m = run(p.amatch((1, 2, 3, 4), limit=2))
+    assert m.bound == {'x0': 2, 'x1': 4, 'x2': 6, 'x3': 8} and peak[0] == 2
+    assert run(p.amatch([1, 2, 3, 4])) is None  # decided synchronously, nothing awaited
+    assert run(asyncio.wait_for(p.amatch((-1, 200, 300, 400)), 1)) is None
+    assert sorted(cancelled) == [200, 300, 400]
+
+    async def block():
+        x0 = None
+        async with await p.amatch((1, 1, 1, 1)):
+            assert x0 == 2
+        assert x0 is None
+    run(block())
+
+
+def test_async_multi_pattern():
+    started = []
+
+    def pattern(t, delay):
+        async def check(o):
+            started.append(t)
+            await asyncio.sleep(delay)
+            return True
+        return ObjectPattern({'obj': {'eval': [IsInstance(t), check], 'bind': {'v': None}}})
+
+    p_int, p_num, p_slow = pattern(int, 0.05), pattern(int, 0), pattern(object, 10)
+
+    async def first():
+        v = None
+        async with AsyncObjectMultiPattern(3, p_int, p_num, p_slow, strategy='first_match') as mp:
+            assert v == 3 and mp.match.pattern is p_int
+        return mp
+    mp = run(asyncio.wait_for(first(), 1))
+    assert set(mp.successful_matches) == {0, 1}  # p_slow was cancelled
+
+    async def ambiguous():
+        async with AsyncObjectMultiPattern(3, p_int, p_num, p_slow):
+            pass
+    with pytest.raises(AmbiguityError):
+        run(asyncio.wait_for(ambiguous(), 1))
+
+    async def no_match():
+        async with AsyncObjectMultiPattern('x', p_int, p_num):
+            pass
+    with pytest.raises(NoMatchingPatternError):
+        run(no_match())
+    with pytest.raises(ValueError):
+        AsyncObjectMultiPattern(1, p_int, strategy='lazy')
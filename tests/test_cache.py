@@ -0,0 +1,120 @@
+# pylint: disable=undefined-variable
+import typing as T
+from collections import namedtuple
+
+import pytest
+
+from pyopm.core import ObjectPattern, ObjectMultiPattern
+from pyopm.cache import MatchCache, default_key
+
+
+def test_pattern_cache():
+    calls = []
+
+    def check(o):
+        calls.append(o)
+        return isinstance(o, (tuple, list)) and len(o) == 2
+
+    p = ObjectPattern({'obj': {'eval': [check], 'bind': {'first': lambda o: o[0]}}})
+    cache = p.enable_cache(maxsize=2)
+    assert p.match((1, 2)).bound == {'first': 1}
+    m = p.match((1, 2))
+    assert m.bound == {'first': 1} and m.obj == (1, 2)
+    m.bound['first'] = 'mutated'
+    assert p.match((1, 2)).bound == {'first': 1}
+    assert p.match((1.0, 2)).bound == {'first': 1.0}  # equal, but not the same key
+    assert p.match(True) is None and p.match(1) is None  # neither are 1 and True
+    assert p.match([1, 2]).bound == {'first': 1}  # unhashable: skipped
+    assert calls == [(1, 2), (1.0, 2), True, 1, [1, 2]]
+    assert cache.stats() == {'hits': 2, 'misses': 4, 'skipped': 1, 'evictions': 2,
+                             'size': 2, 'maxsize': 2}
+    assert p.match((1, 2), eval_locals={}).bound == {'first': 1}  # match args bypass the cache
+    assert cache.invalidate(1) == 1 and cache.invalidate([]) == 0
+    cache.clear()
+    assert len(cache) == 0
+    with pytest.raises(ValueError):
+        MatchCache(0)
+
+
+def test_default_key():
+    p = ObjectPattern({'obj[0]': {'eval': [lambda o: isinstance(o, int)], 'bind': {'x': None}}})
+    p.enable_cache()
+    assert p.match((1, 2)).bound == {'x': 1}
+    assert p.match((1.0, 2)) is None  # equal to (1, 2), but rejected
+    assert default_key(((1, 2.0), 3)) != default_key(((1, 2), 3))
+    assert default_key(0.0) != default_key(-0.0)
+    assert default_key(frozenset({1})) != default_key(frozenset({1.0}))
+    Point = namedtuple('Point', 'x y')
+    assert default_key(Point(1, 2)) != default_key((1, 2)) != default_key(Point(1.0, 2))
+    with pytest.raises(TypeError):
+        default_key(object())  # compares by identity, might be mutated
+
+    class Loose:  # pylint: disable=too-few-public-methods
+        def __eq__(self, other):
+            return True
+        __hash__ = object.__hash__
+
+    with pytest.raises(TypeError):
+        default_key(Loose())
+    q = ObjectPattern({'obj': {'bind': {'o': None}}})
+    cache = q.enable_cache()
+    assert q.match(Loose()) and q.match(Loose()) and cache.stats()['skipped'] == 2
+
+
+def test_mutable_objects_not_cached():
+    class Obj:  # pylint: disable=too-few-public-methods
+        x = 1
+
+    p = ObjectPattern({'obj.x': {'eval': [lambda x: x > 0], 'bind': {'x': None}}})
+    cache = p.enable_cache()
+    o = Obj()
+    assert p.match(o).bound == {'x': 1}
+    o.x = -5
+    assert p.match(o) is None
+    assert cache.stats()['skipped'] == 2 and len(cache) == 0
+
+
+def test_frozen_dataclass_key():
+    dataclasses = pytest.importorskip('dataclasses')
+
+    @dataclasses.dataclass(frozen=True)
+    class Config:
+        name: str
+        size: T.Any = 1
+
+    p = ObjectPattern({'obj.size': {'eval': [lambda s: s != 0], 'bind': {'size': None}}})
+    cache = p.enable_cache()
+    assert p.match(Config('a')).bound == {'size': 1}
+    assert p.match(Config('a')).bound == {'size': 1}
+    assert p.match(Config('a', 1.0)).bound == {'size': 1.0}  # equal, but not the same key
+    assert p.match(Config('a', [1])).bound == {'size': [1]}  # unhashable field: not cached
+    assert cache.stats()['hits'] == 1 and cache.stats()['skipped'] == 1
+    assert default_key(Config('a')) != default_key(Config('b'))
+
+    @dataclasses.dataclass(frozen=True)
+    class Sub(Config):
+        pass
+
+    class Undecorated(Config):  # may have mutable attributes of its own
+        pass
+
+    assert default_key(Sub('a')) != default_key(Config('a'))
+    mutable = dataclasses.dataclass(type('Mutable', (), {'__annotations__': {'x': int}}))
+    for obj in (Undecorated('a'), mutable(1)):
+        with pytest.raises(TypeError):
+            default_key(obj)
+
+
+def test_cache_key_function_and_multi_pattern():
+    p1 = ObjectPattern({'obj.real': {'bind': {'n': None}}})
+    p2 = ObjectPattern({'obj.upper': {'bind': {'s': None}}})
+    cache = MatchCache(key=id)
+    marker = object()
+    p3 = ObjectPattern({'obj': {'eval': [lambda o: o is marker]}}, cache=cache)
+    assert p3.match(marker) and p3.match(marker)
+    assert cache.stats()['hits'] == 1
+    for _ in range(3):
+        mp = ObjectMultiPattern(3, p1, p2, cache=cache)
+        with mp:
+            assert n == 3
+    assert cache.stats()['hits'] == 3
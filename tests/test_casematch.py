@@ -1,3 +1,48 @@
 # pylint: disable=undefined-variable
-from pyopm.core import ObjectPattern, ObjectPatternMatch
-# from pyopm.casematch import SwitchBlock
+import pytest
+
+from pyopm.core import ObjectPattern, ObjectPatternMatch, NoMatchingPatternError
+from pyopm.casematch import SwitchBlock
+from pyopm.predicates import IsInstance
+
+
+class Base:
+    # pylint: disable=too-few-public-methods,missing-class-docstring
+    def __init__(self, value):
+        self.value = value
+
+
+class Child(Base):
+    pass
+
+
+def test_switch_block_type_index():
+    calls = []
+
+    def tracked(t):
+        def check(o):
+            calls.append(t)
+            return True
+        return check
+
+    sb = SwitchBlock(
+        (ObjectPattern({'obj': {'eval': [IsInstance(int), tracked(int)]}}), lambda: 'int'),
+        (ObjectPattern({'obj': {'eval': [IsInstance(Child), tracked(Child)]},
+                        'obj.value': {'bind': {'value': None}}}), lambda value: ('child', value)),
+        (ObjectPattern({'obj': {'eval': [IsInstance(Base), tracked(Base)]}}), lambda: 'base'),
+        (ObjectPattern({'obj': {'eval': [lambda o: isinstance(o, str)]}}), lambda: 'str'),
+    )
+    assert sb.switch(3) == 'int'
+    assert sb.switch(Child(1)) == ('child', 1)
+    assert sb.switch(Base(1)) == 'base'
+    assert sb.switch('x') == 'str'
+    assert calls == [int, Child, Base]  # non-candidate cases were never tried
+    assert [len(sb.candidates(t)) for t in (int, Child, Base, str)] == [2, 3, 2, 1]
+    assert list(sb.switch_many([1, Base(0), 'a', Child(2)])) == \
+        ['int', 'base', 'str', ('child', 2)]
+    with pytest.raises(NoMatchingPatternError):
+        sb.switch(1.5)
+    sb.default = type
+    assert sb.switch(1.5) is float
+    sb.add(ObjectPattern({'obj': {'eval': [IsInstance(float)]}}), lambda: 'float')
+    assert sb.switch(1.5) == 'float'
@@ -0,0 +1,86 @@
+# pylint: disable=undefined-variable,wrong-import-position
+import pytest
+
+from pyopm.core import ObjectPattern
+from pyopm.predicates import Eq, In, Range, IsInstance, Len, All, Any, Regex
+
+np = pytest.importorskip('numpy')
+
+from pyopm.columnar import (ColumnarMatcher, Row, column_path, match_columns,
+                            n_rows, predicate_mask)
+
+
+def table():
+    return np.array([('book', 12.5, 3, 'alice'), ('dvd', 20.0, 0, 'bob'),
+                     ('book', 150.0, 1, 'carol'), ('cd', 8.0, 7, 'dave')],
+                    dtype=[('kind', 'U8'), ('price', 'f8'), ('stock', 'i8'), ('owner', 'U8')])
+
+
+def rowwise(pattern, data):
+    """The reference: ObjectPattern.match on every row."""
+    return [pattern.match(Row(data, i)) is not None for i in range(n_rows(data))]
+
+
+def test_column_path():
+    assert column_path("obj.a['b']") == ('a', 'b')
+    assert column_path('obj') is None
+    assert column_path('obj.a[0]') is None
+    assert column_path('obj.a()') is None
+    assert column_path('obj.items[*].x') is None
+
+
+def test_predicate_masks():
+    column = np.array([1, 5, 10, 15])
+    assert predicate_mask(Range(5, 15), column).tolist() == [False, True, True, False]
+    assert predicate_mask(In([1, 15]), column).tolist() == [True, False, False, True]
+    assert predicate_mask(Any(Eq(1), Eq(10)), column).tolist() == [True, False, True, False]
+    assert predicate_mask(All(Range(2, None), Range(None, 12)), column).tolist() \
+        == [False, True, True, False]
+    assert predicate_mask(IsInstance(str), column).tolist() == [False] * 4
+    assert predicate_mask(Len(Range(2, 4)), np.array(['a', 'abc', 'xy'])).tolist() \
+        == [False, True, True]
+    assert predicate_mask(Range(0, 10), np.array(['a', 'b'])) is None  # not comparable
+    assert predicate_mask(Eq((1, 5)), np.array([1, 5])) is None  # would be broadcast
+    assert predicate_mask(Regex('a'), np.array(['a'])) is None
+    assert predicate_mask(lambda x: x > 1, column) is None
+
+
+def test_match_columns():
+    data = table()
+    p = ObjectPattern({'obj.kind': {'eval': [In({'book', 'dvd'})]},
+                       'obj.price': {'eval': [Range(0, 100)], 'bind': {'price': None,
+                                                                       'total': np.sum}},
+                       "obj['owner']": {'eval': [str.islower, Len(Range(3, None))],
+                                        'bind': {'owner': 'o.tolist()'}}})
+    m = p.match_columns(data)
+    assert m.mask.tolist() == [True, True, False, False] == rowwise(p, data)
+    assert m.rows.tolist() == [0, 1]
+    assert m.bound['price'].tolist() == [12.5, 20.0] and m.bound['total'] == 32.5
+    assert m.bound['owner'] == ['alice', 'bob']
+
+    # dict of arrays, nested columns, row by row keys and opaque tests
+    data = {'pos': {'x': np.array([0, 1, 2, 3]), 'y': [3, 2, 1, 0]},
+            'name': np.array(['a', 'bb', 'ccc', 'dddd'])}
+    p = ObjectPattern({'obj.pos.x': {'eval': [lambda x: x % 2 == 1]},
+                       'obj.pos': {'bind': {'pos': None}},
+                       'obj.name.upper()': {'eval': [Regex('^[A-C]+$')], 'bind': {'up': None}}})
+    m = p.match_columns(data)
+    assert m.mask.tolist() == [False, True, False, False] == rowwise(p, data)
+    assert m.bound['up'] == ['BB']
+    assert m.bound['pos']['x'].tolist() == [1] and m.bound['pos']['y'].tolist() == [2]
+    assert repr(ColumnarMatcher(p)) == '<ColumnarMatcher columns=2 rowwise=1/>'
+
+    # a missing column matches no row, several patterns at once
+    missing = ObjectPattern({'obj.nope': {'eval': [Eq(1)], 'bind': {'n': None}}})
+    cheap = ObjectPattern({'obj.price': {'eval': [Range(None, 10)]}})
+    results = match_columns(table(), missing, cheap)
+    assert results[0].mask.tolist() == [False] * 4 and results[0].bound == {}
+    assert results[1].mask.tolist() == [False, False, False, True]
+
+
+def test_columnar_errors_fall_back():
+    data = {'x': np.array([1, 0, 2], dtype=object)}
+    p = ObjectPattern({'obj.x': {'eval': [IsInstance(int), lambda x: 2 // x > 0]}})
+    with pytest.warns(UserWarning):
+        m = p.match_columns(data)
+    assert m.mask.tolist() == [True, False, True]
@@ -3,6 +3,10 @@ import re
 import os
 import sys
 import dis
+import subprocess
+import warnings
+import itertools
+from types import SimpleNamespace
 
 import pytest
 
@@ -14,7 +18,12 @@ if cwd not in sys.path:
 
 import pyopm
 from pyopm.core import (ObjectPattern, ObjectPatternMatch, ObjectMultiPattern, matcher_pattern,
-                        AmbiguityError, NoMatchingPatternError)
+                        AmbiguityError, NoMatchingPatternError, compile_accessors,
+                        break_attr_path, STEP_ROOT, STEP_GET, STEP_EVAL, STEP_ERROR,
+                        code_info)
+from pyopm.paths import (parse_path, DYNAMIC, SEG_ROOT, SEG_ATTR, SEG_ITEM, SEG_CALL, SEG_SLICE,
+                         SEG_EACH)
+from pyopm.predicates import Range
 
 
 CONFIG_DEFAULT = {
@@ -146,6 +155,45 @@ def test_start_end_block_deref():
     assert (d, e, f) == (4, 5, 6)
 
 
+def test_start_end_block_change_detection():
+    o = Dummy6([1], 2, 3, 4, 5, 6)
+    for mode, restored in (('equality', True), ('identity', False)):
+        cfg = {**CONFIG_DEFAULT, 'changed existing': 'keep', 'change detection': mode}
+        m = ObjectPattern({'obj.a': {'bind': {'a': None}}}, config=cfg).match(o)
+        a = 'original'
+        with m:
+            a = [1]  # equal, but not identical
+        assert (a == 'original') is restored
+    assert code_info(test_start_end_block_change_detection.__code__) is \
+        code_info(test_start_end_block_change_detection.__code__)
+
+
+def test_binding_backend():
+    expected = ('pep667' if sys.version_info >= (3, 13) else
+                {'cpython': 'ctypes', 'pypy': 'pypy'}.get(sys.implementation.name, 'none'))
+    assert pyopm.core.BINDING_BACKEND == expected
+
+
+def test_lazy_imports():
+    code = ('import sys, pyopm; print(" ".join(sorted(sys.modules)))\n'
+            'assert pyopm.SwitchBlock.__module__ == "pyopm.casematch"\n'
+            'assert pyopm.core.matcher_pattern is pyopm.core.matcher_pattern\n'
+            'assert "ParallelMatcher" in dir(pyopm)\n'
+            'import pyopm.overloading\n'
+            'from pyopm import overload\n'
+            'assert overload is pyopm.overloading.overload')
+    out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(pyopm.__path__[0]),
+                         check=True, stdout=subprocess.PIPE,
+                         universal_newlines=True).stdout.split()
+    lazy = ('asyncio', 'ctypes', 'pprint', 'pyopm.aio')
+    if sys.version_info >= (3, 7):  # python 3.6 has no module __getattr__, loads all eagerly
+        lazy += ('concurrent.futures', 'inspect', 'pyopm.parallel', 'pyopm.casematch')
+    for name in lazy:
+        assert name not in out
+    with pytest.raises(AttributeError):
+        pyopm.does_not_exist  # pylint: disable=pointless-statement
+
+
 def test_object_pattern_basic():
     """Test ObjectPattern (basic use cases)."""
     pattern = ObjectPattern({
@@ -307,6 +355,119 @@ def test_basic_object_multi_pattern():
     assert e.value.args[0] == f'{None!r} did not match any pattern!'
 
 
+def test_multi_pattern_strategies():
+    calls = []
+
+    def pattern(t):
+        def check(o):
+            calls.append(t)
+            return isinstance(o, t)
+        return ObjectPattern({'obj': {'eval': [check], 'bind': {'kind': lambda o: t}}})
+
+    patterns = [pattern(int), pattern(str), pattern(object), pattern(float)]
+
+    mp = ObjectMultiPattern('x', *patterns, strategy='first_match')
+    assert calls == [int, str]
+    assert bool(mp)
+    with mp:
+        assert kind is str
+    assert calls == [int, str]
+    assert len(mp) == 2  # explicitly asking for all matches evaluates the rest
+    assert calls == [int, str, object, float]
+
+    calls.clear()
+    mp = ObjectMultiPattern('x', *patterns, strategy='lazy')
+    assert calls == []
+    assert next(mp.matches) is None
+    assert calls == [int]
+    with mp:
+        assert kind is str
+    assert calls == [int, str]
+
+    calls.clear()
+    with pytest.raises(AmbiguityError):
+        with ObjectMultiPattern('x', *patterns, strategy='lazy', allow_ambiguities=False):
+            pass
+    assert calls == [int, str, object, float]
+
+    with pytest.raises(NoMatchingPatternError):
+        with ObjectMultiPattern('x', patterns[0], patterns[3], strategy='first_match'):
+            pass
+    with pytest.raises(ValueError):
+        ObjectMultiPattern('x', *patterns, strategy='fastest')
+
+
+def test_batch_matching():
+    p = ObjectPattern({'obj': {'eval': [lambda o: isinstance(o, int)], 'bind': {'n': None}}})
+    data = [1, 'a', 2, None]
+    assert [m and m.bound for m in p.match_many(data)] == [{'n': 1}, None, {'n': 2}, None]
+    assert list(p.match_many(data, bindings_only=True)) == [{'n': 1}, None, {'n': 2}, None]
+    assert [m.obj for m in p.filter(iter(data))] == [1, 2]
+    hits, misses = p.partition(iter(data), bindings_only=True)
+    assert (list(hits), list(misses)) == ([{'n': 1}, {'n': 2}], ['a', None])
+    stream = p.match_many(itertools.count(), bindings_only=True)  # unbounded input
+    assert next(stream) == {'n': 0} and next(stream) == {'n': 1}
+
+    q = ObjectPattern({'obj': {'eval': [lambda o: isinstance(o, str)]}})
+    r = ObjectPattern({'obj': {'eval': [lambda o: o == 2]}})
+    assert list(ObjectMultiPattern.match_many([1, 'a', None], p, q, r, bindings_only=True)) == \
+        [(0, {'n': 1}), (1, {}), None]
+    with pytest.raises(AmbiguityError):
+        list(ObjectMultiPattern.match_many([2], p, q, r))
+    firsts = ObjectMultiPattern.filter(data, p, q, r, strategy='first_match', bindings_only=True)
+    assert list(firsts) == [(0, {'n': 1}), (1, {}), (0, {'n': 2})]
+    hits, misses = ObjectMultiPattern.partition(data, p, q, r, strategy='lazy')
+    assert [i for i, _ in hits] == [0, 1, 0] and list(misses) == [None]
+    with pytest.raises(ValueError):
+        ObjectMultiPattern.match_many(data, p, strategy='fastest')
+
+
+def test_lazy_bindings():
+    calls = []
+
+    def expensive(o):
+        calls.append(o)
+        return list(o())
+
+    p = ObjectPattern({'obj.items': {'bind': {'items': expensive, 'n': 'len(o())'}},
+                       'obj.keys': {'bind': {'keys': expensive}}})
+    for match in (p.match, p.compile()):
+        calls.clear()
+        m = match({1: 2})
+        assert m and calls == []
+        assert m.bound.pending == ('items', 'n', 'keys')
+        assert m.keys == [1] and len(calls) == 1
+        assert m.bound['keys'] == [1] and len(calls) == 1
+        assert 'items' in m.bound and len(calls) == 1
+        assert m.bound.pending == ('items', 'n')
+        assert m.n == 1
+        with pytest.raises(AttributeError):
+            print(m.values)
+        with m:
+            assert items == [(1, 2)]
+        assert len(calls) == 2
+        m.bound['keys'] = 'changed'
+        assert dict(m.bound) == {'items': [(1, 2)], 'n': 1, 'keys': 'changed'}
+
+
+def test_frame_free_bindings():
+    p = ObjectPattern({'obj.keys': {'bind': {'keys': lambda o: list(o())}},
+                       'obj.values': {'bind': {'values': lambda o: list(o())}}})
+    m = p.match({1: 'a'})
+    keys, values = m
+    assert (keys, values) == ([1], ['a'])
+    r = m.record()
+    assert type(r) is p.record_type and r.keys == [1] and r.values == ['a']
+    assert tuple(r) == ([1], ['a']) and len(r) == 2
+    assert repr(r) == "Bindings(keys=[1], values=['a'])"
+    assert r._asdict() == {'keys': [1], 'values': ['a']}
+    assert p.record_type is ObjectPattern({'x': {'bind': {'keys': 1, 'values': 2}}}).record_type
+    assert not hasattr(r, '__dict__') and not hasattr(m, '__dict__')
+    with pytest.raises(ValueError):
+        ObjectPattern({'obj': {'bind': {'not valid': None}}}).record_type
+    assert list(ObjectPattern({}).match(1)) == []
+
+
 def test_str_repr():
     p = ObjectPattern({})
     p2 = ObjectPattern({'obj': {'eval': [callable]}})
@@ -336,6 +497,160 @@ def test_context_handler():
         #     print(eval('items'))  # pylint: disable=eval-used
         assert list(eval('items')) == [(0, 1), (1, 'two'), (2, 3.0)]
 
+def test_compiled_accessors():
+    kinds = [k for k, _, _ in compile_accessors(break_attr_path("obj.a['b'][0].keys()"))]
+    assert kinds == [STEP_ROOT, STEP_GET, STEP_GET, STEP_GET, STEP_GET]
+    kinds = [k for k, _, _ in compile_accessors(break_attr_path('obj.get(key)[1:3][::x]'))]
+    assert kinds == [STEP_ROOT, STEP_EVAL, STEP_GET, STEP_EVAL]
+    assert compile_accessors(('obj', '[1:'))[1][0] == STEP_ERROR
+    p = ObjectPattern({
+        "obj['x'][1]": {'bind': {'x1': None}},
+        'obj.keys()': {'eval': [lambda k: 'x' in k], 'bind': {'n': 'len(o)'}},
+        'other.real': {'bind': {'real': None}},
+    })
+    m = p.match({'x': [0, 1]}, eval_locals={'other': 3})
+    assert m.bound == {'x1': 1, 'n': 1, 'real': 3}
+    assert p.match({'y': 0}, eval_locals={'other': 3}) is None
+    assert p.match({'x': [0, 1]}) is None  # other is not defined
+
+
+def test_parse_path():
+    assert break_attr_path('obj.d["a.b]"].f(1, x=(2, 3))()[::2]') == (
+        'obj', '.d', '["a.b]"]', '.f(1, x=(2, 3))()', '[::2]')
+    assert [s.kind for s in parse_path('obj.d["a.b]"].f(1, x=(2, 3))()[::2][*]')] == [
+        SEG_ROOT, SEG_ATTR, SEG_ITEM, SEG_ATTR, SEG_CALL, SEG_CALL, SEG_SLICE, SEG_EACH]
+    assert parse_path('obj.f(1, x=(2, 3))')[2].value == ((1,), (('x', (2, 3)),))
+    assert parse_path('obj[a]')[1].value is DYNAMIC and parse_path('obj(*a)')[1].value is DYNAMIC
+    assert break_attr_path('len(obj).real') == ('len(obj)', '.real')
+    assert break_attr_path('obj.0') == ('obj.0',) and break_attr_path('(obj)') == ('(obj)',)
+    assert parse_path('obj.a') is parse_path('obj.a')  # cached
+    p = ObjectPattern({'obj["a.b"].split(".", 1)[1:]': {'bind': {'rest': None}},
+                       'obj.get("c", 0)': {'eval': [lambda c: c == 0]}})
+    assert p.match({'a.b': 'x.y.z'}).bound == {'rest': ['y.z']}
+    assert p.match({'a.b': 'x.y.z', 'c': 1}) is None
+
+    # mutable literal arguments are not shared between matches (nor patterns)
+    key = "obj.get('tags', [])"
+    p, q = (ObjectPattern({key: {'bind': {'tags': None}}}) for _ in range(2))
+    p.match({}).bound['tags'].append('x')
+    assert p.match({}).bound['tags'] == [] and p.compile()({}).bound['tags'] == []
+    assert q.match({}).bound['tags'] == []
+    assert compile_accessors(break_attr_path(key))[1][0] == STEP_EVAL
+    assert compile_accessors(break_attr_path("obj.get('t', (1,))"))[1][0] == STEP_GET
+
+
+def test_path_trie_shared_prefixes():
+    calls = []
+
+    class Node:
+        # pylint: disable=too-few-public-methods,missing-class-docstring
+        def __init__(self, **kw):
+            self.__dict__.update(kw)
+
+        def __getattribute__(self, name):
+            calls.append(name)
+            return object.__getattribute__(self, name)
+
+    p = ObjectPattern({
+        'obj.a.b.c': {'bind': {'c': None}},
+        'obj.x': {'eval': [lambda x: x == 1]},
+        'obj.a.b.d': {'bind': {'d': None}},
+        'obj.a.b': {'bind': {'c': lambda b: 'overwritten'}},
+    })
+    assert [n.source for n in p.compiled_pattern[0].walk()] == [
+        'obj', 'obj.a', 'obj.a.b', 'obj.a.b.c', 'obj.a.b.d', 'obj.x']
+    o = Node(a=Node(b=Node(c=3, d=4)), x=1)
+    m = p.match(o)
+    assert m.bound == {'c': 'overwritten', 'd': 4}  # binds are applied in key order
+    assert sorted(calls) == ['__dict__'] * 3 + ['a', 'b', 'c', 'd', 'x']
+    assert p.match(Node(a=Node(b=Node(c=3, d=4)), x=2)) is None
+
+
+def test_element_paths():
+    class Item:
+        # pylint: disable=too-few-public-methods,missing-class-docstring
+        def __init__(self, price):
+            self.price = price
+
+    seen = []
+
+    def positive(x):
+        seen.append(x)
+        return x > 0
+
+    p = ObjectPattern({
+        'obj.items[*].price': {'eval': [positive], 'bind': {'prices': list}},
+        'obj.items[:2].price': {'eval': [lambda x: x < 10], 'quantifier': 'any'},
+        "obj.tags.values()[*]": {'eval': [str.islower], 'quantifier': Range(2, None)},
+        'obj.items[:2]': {'eval': [lambda l: len(l) == 2]},  # no quantifier: a sliced value
+    })
+    o = SimpleNamespace(items=[Item(5), Item(20), Item(1)], tags={'a': 'x', 'b': 'y', 'c': 'Z'})
+    m = p.match(o)
+    assert m.bound == {'prices': [5, 20, 1]}
+    assert p.compile()(o).bound == {'prices': [5, 20, 1]}
+    o.items = (Item(p) for p in [-1] + [1] * 10 ** 6)  # a lazy stream: stops at the first item
+    del seen[:]
+    assert p.match(o) is None and seen == [-1]
+    o.items = [Item(20), Item(30), Item(4)]
+    assert p.match(o) is None  # any: only the first two items count
+    o.items = [Item(1), Item(2), 'no price']
+    assert p.match(o) is None  # all: an element without a price fails
+    o.items, o.tags = [Item(1), Item(2)], {'a': 'X', 'b': 'y'}
+    assert p.match(o) is None  # count: only one lowercase tag
+    o.tags = {'a': 'x', 'b': 'y'}
+    assert ObjectMultiPattern(o, p).successful_matches[0].bound == {'prices': [1, 2]}
+    nested = ObjectPattern({'obj[*][*]': {'eval': [lambda x: x % 2 == 0]},
+                            'obj[-2:][*]': {'eval': [lambda x: x > 2], 'bind': {'last': list}}})
+    assert nested.match([[2, 4], [6]]) is None
+    assert nested.match([[0], [4, 6], [8]]).bound == {'last': [4, 6, 8]}
+    assert nested.match(5) is None
+    for spec in ({'eval': [lambda x: x > 0], 'quantifier': 'any'},  # no element segment
+                 {'quantifier': 'bogus'}):
+        with pytest.raises(ValueError):
+            ObjectPattern({'obj.items': spec}).match(o)
+    with pytest.raises(ValueError):
+        ObjectPattern({'obj.items[*]': {'quantifier': 'bogus'}}).compile()
+
+
+def test_compiled_matcher():
+    def raising(o):
+        raise ValueError('DEAD')
+
+    patterns = [
+        ObjectPattern({}),
+        ObjectPattern({'obj': {'eval': [lambda o: isinstance(o, dict)]},
+                       "obj['a'].real": {'eval': [lambda x: x > 0],
+                                         'bind': {'r': None, 's': 'o + 1', 'f': float}},
+                       'obj.keys()': {'bind': {'k': list}}}),
+        ObjectPattern(PD6),
+        ObjectPattern({'obj.a': {'eval': [raising]}}),
+        ObjectPattern({'obj.a': {'eval': [bool], 'bind': {'a': None}},
+                       'obj.b': {'bind': {'a': None}}}, verbose=True),
+    ]
+    objects = [None, {'a': 3}, {'a': -3}, {'b': 1}, Dummy6(*range(6)), Dummy6(*range(1, 7))]
+    for p in patterns:
+        f = p.compile()
+        assert f is p.compile()
+        for o in objects:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                expected, got = p.match(o), f(o)
+            assert (expected is None) == (got is None)
+            if expected is not None:
+                assert got.bound == expected.bound and got.pattern is p and got.obj is o
+    with pytest.warns(UserWarning) as e:
+        assert patterns[3].compile()(Dummy6(*range(6))) is None
+    assert e[0].message.args[0].startswith('Error running')
+    with pytest.warns(UserWarning) as e:
+        assert patterns[4].compile()(Dummy6(*range(6))) is None
+    assert e[0].message.args[0].startswith('Test failed')
+    with pytest.warns(UserWarning) as e:
+        assert patterns[4].compile()(Dummy6(*range(1, 7))).bound == {'a': 2}
+    assert e[0].message.args[0] == "Overwriting binding for 'a'"
+    p = ObjectPattern({'other.real': {'bind': {'r': None}}, 'obj': {'bind': {'o': None}}})
+    assert p.compile()(1, eval_locals={'other': 2, 'obj': 3}).bound == {'r': 2, 'o': 3}
+
+
 def test_meta_match():
     """Test the matcher_pattern."""
     assert bool(matcher_pattern.match(ObjectPattern))
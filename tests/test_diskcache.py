@@ -0,0 +1,60 @@
+# pylint: disable=undefined-variable
+from pyopm.core import ObjectPattern
+from pyopm.diskcache import CompileCache, MAGIC, active
+from pyopm.paths import parse_path, _compile_step
+from pyopm.predicates import Range
+
+
+def make_patterns(limit):
+    return [ObjectPattern({'obj': {'eval': [lambda o: isinstance(o, dict)]},
+                           "obj['n'].real": {'eval': [Range(0, limit)], 'bind': {'n': None}},
+                           "obj.get('name', '')[1:]": {'bind': {'rest': 'o.upper()'}}})
+            for limit in (10, 100)]
+
+
+def clear_memory_caches():
+    parse_path.cache_clear()
+    _compile_step.cache_clear()
+
+
+def test_compile_cache(tmp_path):
+    path = tmp_path / 'patterns.pyopm'
+    clear_memory_caches()
+    cache = CompileCache(path)
+    assert len(cache) == 0 and active() is None
+    first = cache.warm(make_patterns(10))
+    assert active() is None and path.exists()
+    assert cache.stats()['misses'] > 0 and cache.hits > 0  # both patterns compile alike
+
+    clear_memory_caches()
+    cache = CompileCache(path)
+    size = len(cache)
+    second = cache.warm(make_patterns(10))
+    assert cache.misses == 0 and cache.hits > 0 and not cache.dirty
+    for patterns in (first, second):
+        m = patterns[1].compile()({'n': 42, 'name': 'xyz'})
+        assert m.bound == {'n': 42, 'rest': 'YZ'}
+        assert patterns[0].compile()({'n': 42}) is None
+
+    # changed definitions miss, stale entries are dropped when saving
+    clear_memory_caches()
+    cache = CompileCache(path)
+    cache.warm([ObjectPattern({'obj.imag': {'eval': [Range(0, 1)]}})])
+    assert cache.misses > 0 and 0 < len(CompileCache(path)) < size + cache.misses
+
+
+def test_invalid_cache_file(tmp_path):
+    path = tmp_path / 'patterns.pyopm'
+    path.write_bytes(MAGIC[:-1] + b'\0garbage')
+    cache = CompileCache(path)
+    assert len(cache) == 0 and not cache.load()
+    path.write_bytes(MAGIC + b'garbage')
+    assert not CompileCache(path).load()
+    clear_memory_caches()
+    with cache:
+        assert active() is cache
+        p = make_patterns(5)[0]
+        assert p.match({'n': 3}).bound == {'n': 3, 'rest': ''}
+    assert active() is None and cache.dirty
+    cache.save()
+    assert len(CompileCache(path)) == len(cache) > 0
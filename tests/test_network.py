@@ -0,0 +1,99 @@
+# pylint: disable=undefined-variable
+import os
+import sys
+
+cwd = os.path.realpath('.')
+if cwd not in sys.path:
+    sys.path.insert(0, cwd)
+
+from pyopm.core import ObjectPattern, ObjectMultiPattern
+from pyopm.network import PatternNetwork, pattern_network
+
+
+class Msg:
+    # pylint: disable=too-few-public-methods,missing-class-docstring
+    def __init__(self, kind, value):
+        self.kind, self.value = kind, value
+
+
+def test_network_shares_paths_and_predicates():
+    calls = []
+
+    def is_msg(o):
+        calls.append('is_msg')
+        return isinstance(o, Msg)
+
+    patterns = [ObjectPattern({'obj': {'eval': [is_msg]},
+                               'obj.kind': {'eval': [lambda k, i=i: k == i]},
+                               'obj.value': {'bind': {'value': None}}})
+                for i in range(50)]
+    net = PatternNetwork(patterns)
+    assert len(net) == 50
+    assert len(net.nodes) == 3
+    assert net.test_count == 51
+    (i, m), = net.match_all(Msg(7, 'x'))
+    assert calls == ['is_msg']
+    assert i == 7 and m.bound == {'value': 'x'}
+    assert [i for i, _ in net.match_all(Msg(7, 'x'))] == \
+        [i for i, p in enumerate(patterns) if p.match(Msg(7, 'x'))]
+    calls.clear()
+    assert net.match_all(None) == []
+    assert calls == ['is_msg']
+
+
+def test_network_missing_paths():
+    p1 = ObjectPattern({'obj.a.b': {'bind': {'b': None}}})
+    p2 = ObjectPattern({'obj.c': {'bind': {'c': None}}})
+    p3 = ObjectPattern({})
+    o = Msg(1, 2)
+    o.c = 3
+    (i2, m2), (i3, m3) = PatternNetwork([p1, p2, p3]).match_all(o)
+    assert (i2, i3) == (1, 2)
+    assert m2.bound == {'c': 3}
+    assert m3.bound == {}
+
+
+def test_multi_pattern_uses_cached_network():
+    p1 = ObjectPattern({'obj': {'eval': [lambda o: isinstance(o, int)]}})
+    p2 = ObjectPattern({'obj': {'eval': [lambda o: isinstance(o, str)]}})
+    assert pattern_network((p1, p2)) is pattern_network((p1, p2))
+    mp = ObjectMultiPattern('x', p1, p2)
+    assert list(mp.successful_matches) == [1]
+    assert mp.matches[0] is None and mp.matches[1].obj == 'x'
+
+
+def test_multi_pattern_reuses_network():
+    patterns = [ObjectPattern({'obj.kind': {'eval': [lambda k, i=i: k == i]},
+                               'obj.value': {'bind': {'value': None}}})
+                for i in range(10)]
+    net = PatternNetwork(patterns)
+    mp = ObjectMultiPattern(Msg(3, 'x'), net)
+    assert mp.patterns == net.patterns and list(mp.successful_matches) == [3]
+    with mp:
+        assert value == 'x'
+    assert ObjectMultiPattern(Msg(3, 'x'), net, strategy='first_match').match is None
+    assert list(ObjectMultiPattern(Msg(3, 'x'), net, strategy='lazy').successful_matches) == [3]
+    assert [r and r[0] for r in ObjectMultiPattern.match_many([Msg(1, 0), Msg(-1, 0)], net)] \
+        == [1, None]
+
+
+def test_network_equality_index():
+    from pyopm.predicates import Eq, IsInstance
+    calls = []
+
+    def spy(o):
+        calls.append(o)
+        return True
+
+    patterns = [ObjectPattern({'obj': {'eval': [spy, IsInstance(Msg)]},
+                               'obj.kind': {'eval': [Eq(i % 10)]}})
+                for i in range(30)]
+    patterns.append(ObjectPattern({'obj.kind': {'eval': [Eq(1), Eq(2)]}}))
+    net = PatternNetwork(patterns)
+    assert net.nodes[0][6][0][0] == IsInstance(Msg)  # cheap type guard first
+    assert len(net.nodes[0][6]) == 2  # IsInstance was merged across all patterns
+    assert net.nodes[1][8] is not None and len(net.nodes[1][8]) == 10
+    assert [i for i, _ in net.match_all(Msg(3, None))] == [3, 13, 23]
+    assert len(calls) == 1
+    assert net.match_all(Msg([], None)) == []  # unhashable values are compared one by one
+    assert net.match_all(Msg(1, None))[-1][0] != len(patterns) - 1
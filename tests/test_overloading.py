@@ -0,0 +1,65 @@
+# pylint: disable=undefined-variable,function-redefined
+import pytest
+
+from pyopm.core import ObjectPattern, NoMatchingPatternError, AmbiguityError
+from pyopm.overloading import overload, Overload
+from pyopm.predicates import IsInstance, Range
+
+
+def test_type_based_overload():
+    @overload({'obj.x': {'eval': [IsInstance(int)]}})
+    def describe(x, unit='m'):
+        """Describe x."""
+        return f'int {x}{unit}'
+
+    @describe.register({'obj.x': {'eval': [IsInstance(str)]}, 'obj.y': {}})
+    def describe(x, y):
+        return f'str {x} {y}'
+
+    assert isinstance(describe, Overload) and describe.__doc__ == 'Describe x.'
+    assert describe(1) == 'int 1m' and describe(2, unit='s') == 'int 2s'
+    assert describe('a', 'b') == 'str a b' and describe('a', y=1) == 'str a 1'
+    assert all(func is not None for func, _ in describe._cache.values())  # all cached
+    with pytest.raises(NoMatchingPatternError):
+        describe('a')  # the str implementation needs y
+    with pytest.raises(NoMatchingPatternError):
+        describe(1.5)
+
+    @describe.register({'obj.x': {'eval': [IsInstance(bool)]}})
+    def describe(x):
+        return f'bool {x}'
+
+    with pytest.raises(AmbiguityError):
+        describe(True)  # bool is an int too
+    assert describe(3) == 'int 3m' and describe.resolve(3).__name__ == 'describe'
+
+
+def test_overload_with_value_tests():
+    calls = []
+
+    def small(o):
+        calls.append(o)
+        return o < 10
+
+    @overload({'obj.n': {'eval': [IsInstance(int), small]}})
+    def size(n):
+        return 'small'
+
+    @size.register(ObjectPattern({'obj.n': {'eval': [IsInstance(int), Range(10, None)]}}))
+    def size(n):
+        return 'big'
+
+    @size.register({'obj.n': {'eval': [IsInstance(str)]}})
+    def size(n):
+        return 'text'
+
+    assert [size(1), size(20), size('x'), size(n=5)] == ['small', 'big', 'text', 'small']
+    assert calls == [1, 20, 5]  # the str call never ran the int tests
+
+    class Shape:
+        # pylint: disable=too-few-public-methods,missing-class-docstring
+        @overload({'obj.k': {'eval': [IsInstance(int)]}})
+        def scale(self, k):
+            return k * 2
+
+    assert Shape().scale(3) == 6
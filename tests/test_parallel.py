@@ -0,0 +1,51 @@
+# pylint: disable=undefined-variable
+import pickle
+
+import pytest
+
+from pyopm.core import ObjectPattern, ObjectPatternMatch, matcher_pattern
+from pyopm.predicates import IsInstance, Range
+from pyopm.parallel import ParallelMatcher, parallel_match, resolve_patterns
+
+EVEN = ObjectPattern({'obj': {'eval': [IsInstance(int)], 'bind': {'n': None}},
+                      'obj.real': {'eval': [Range(0, 1000)]}})
+
+
+def test_pattern_pickling():
+    EVEN.compile()
+    p = pickle.loads(pickle.dumps(EVEN))
+    assert p.pattern == EVEN.pattern
+    assert p.match(3).bound == {'n': 3}
+
+
+def test_resolve_patterns():
+    assert resolve_patterns('pyopm.core:matcher_pattern') is matcher_pattern
+    assert resolve_patterns([EVEN]) == (EVEN,)
+    with pytest.raises(ValueError):
+        resolve_patterns('pyopm.core')
+
+
+def test_parallel_matcher():
+    data = list(range(990, 1010)) + ['x']
+    with ParallelMatcher(EVEN, max_workers=2, chunksize=3) as pm:
+        results = list(pm.map(data))
+        assert [r and r.bound for r in results] == [{'n': x} if x < 1000 else None
+                                                    for x in data[:-1]] + [None]
+        assert isinstance(results[0], ObjectPatternMatch) and results[0].pattern is EVEN
+        unordered = sorted(pm.map(data, ordered=False, bindings_only=True))
+        assert [r for _, r in unordered] == [r and r.bound for r in results]
+    results = list(parallel_match([str, None, 1], 'pyopm.core:matcher_pattern',
+                                  max_workers=1, chunksize=2))
+    assert [bool(r) for r in results] == [False, False, False]
+    multi = list(parallel_match(['a', 5, 5000], [matcher_pattern, EVEN], max_workers=1,
+                                bindings_only=True))
+    assert multi == [None, (1, {'n': 5}), None]
+
+
+def test_parallel_matcher_without_initializer(monkeypatch):
+    monkeypatch.setattr('pyopm.parallel._POOL_INITIALIZER', False)  # like Python 3.6
+    with ParallelMatcher([matcher_pattern, EVEN], max_workers=2, chunksize=2) as pm:
+        assert list(pm.map(['a', 5, 5000, 7, 8], bindings_only=True)) == [
+            None, (1, {'n': 5}), None, (1, {'n': 7}), (1, {'n': 8})]
+    with pytest.raises(ValueError):
+        ParallelMatcher(EVEN, mp_context=object())
@@ -0,0 +1,43 @@
+# pylint: disable=undefined-variable
+import pickle
+import itertools
+
+import pytest
+
+from pyopm.core import ObjectPattern
+from pyopm.predicates import (IsInstance, Eq, In, Range, Regex, Len, All, Any, Quantified,
+                              order_tests, predicate_key)
+
+
+def test_predicates():
+    assert IsInstance(int, str)(1) and not IsInstance((int, str))(1.0)
+    assert Eq(3)(3) and not Eq(3)(4)
+    assert In([1, 2])(2) and not In([1, 2])([]) and In([[1]])([1])
+    assert Range(1, 5)(1) and not Range(1, 5)(5) and Range(high=0)(-9) and not Range(1)('x')
+    assert Regex(r'\d+')('ab12') and not Regex(r'\d+')(12)
+    assert Len(2)('ab') and Len(Range(3))('abc') and not Len(1)(1)
+    assert All(IsInstance(int), Range(0, 10))(5) and not All(IsInstance(int), Range(0, 10))(50)
+    assert Any(Eq(1), Eq('a'))('a') and not Any()(1)
+    assert Quantified([IsInstance(int)])([1, 2]) and not Quantified([Eq(1)], 'all')(iter([1, 2]))
+    assert Quantified([Eq(2)], 'any')(itertools.count()) and Quantified([Eq(1)], Eq(0))([])
+    with pytest.raises(ValueError):
+        Quantified([], 'some')
+
+
+def test_predicates_are_values():
+    preds = [IsInstance(int, str), Eq(3), In([1, 2]), In([[1]]), Range(1, 5), Regex('a+'),
+             Len(Range(1, 3)), All(Eq(1), IsInstance(int)), Any(Eq(1), Eq(2)),
+             Quantified([Eq(1)], Range(1, 2))]
+    for p in preds:
+        assert pickle.loads(pickle.dumps(p)) == p
+    assert Eq(3) == Eq(3) and hash(Eq(3)) == hash(Eq(3)) and Eq(3) != Eq(3.5)
+    assert repr(All(Eq(1), IsInstance(int))) == 'All(Eq(1), IsInstance(int))'
+
+
+def test_order_tests():
+    assert order_tests([len, Regex('x'), IsInstance(int), Eq(1), IsInstance(int), len]) == \
+        (IsInstance(int), Eq(1), Regex('x'), len)
+    p = ObjectPattern({'obj': {'eval': [lambda o: o.real > 0, IsInstance(int)]}})
+    assert p.compiled_pattern[0].keys[0][1][0] == IsInstance(int)
+    assert p.match('x') is None  # the lambda would have raised
+    assert p.match(2)
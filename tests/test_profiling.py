@@ -0,0 +1,65 @@
+# pylint: disable=undefined-variable
+import json
+
+import pytest
+
+from pyopm.core import ObjectPattern, ObjectMultiPattern
+from pyopm.predicates import IsInstance, Range
+from pyopm.profiling import MatchProfiler
+
+
+def test_profiled_pattern():
+    events = []
+    profiler = MatchProfiler(callback=events.append, label=lambda p: 'ints')
+    p = ObjectPattern({'obj': {'eval': [IsInstance(int)]},
+                       'obj.real': {'eval': [Range(0, 10)], 'bind': {'n': None}},
+                       'obj.imag': {'bind': {'i': lambda o: o + 1}}}, profiler=profiler)
+    assert p.match(3).bound == {'n': 3, 'i': 1}
+    assert p.match(30) is None
+    assert p.match('x') is None
+    assert p.compile()(4).bound == {'n': 4, 'i': 1}  # compiled matchers are profiled too
+    assert list(p.match_many([5, -1], bindings_only=True)) == [{'n': 5, 'i': 1}, None]
+    data = profiler.as_dict()
+    json.dumps(data)
+    stats = data['patterns']['ints']
+    assert (stats['attempts'], stats['matches'], stats['wins']) == (6, 3, 0)
+    assert stats['rejections'] == {'obj.real: Range(0, 10)': 2, 'obj: IsInstance(int)': 1}
+    assert data['paths']['obj']['count'] == 6 and data['paths']['obj.imag']['count'] == 3
+    assert data['tests']['obj.real: Range(0, 10)']['calls'] == 5
+    assert data['tests']['obj.real: Range(0, 10)']['rejections'] == 2
+    assert data['binds'] == {'n': {'count': 3, 'time': pytest.approx(0, abs=1)},
+                             'i': {'count': 3, 'time': pytest.approx(0, abs=1)}}
+    assert [e['event'] for e in events] == ['match', 'reject', 'reject', 'match', 'match',
+                                            'reject']
+    assert events[1]['rule'] == 'obj.real: Range(0, 10)'
+    assert p.match(None) is None
+    assert profiler.as_dict()['patterns']['ints']['rejections']['obj: IsInstance(int)'] == 2
+    profiler.reset()
+    assert profiler.as_dict() == {'patterns': {}, 'paths': {}, 'tests': {}, 'binds': {}}
+    p.profiler = None
+    assert p.match(3).bound == {'n': 3, 'i': 1} and profiler.patterns == {}
+
+
+def test_profiled_missing_path_and_errors():
+    profiler = MatchProfiler()
+    p = ObjectPattern({'obj.missing': {}}, profiler=profiler)
+    assert p.match(1) is None
+    assert profiler.paths['obj.missing'][:2] == [1, 1]
+    q = ObjectPattern({'obj': {'eval': [lambda o: 1 / 0]}}, profiler=profiler)
+    with pytest.warns(UserWarning):
+        assert q.match(1) is None
+    (name, (calls, rejections, errors, _)), = profiler.tests.items()
+    assert name.startswith('obj: ') and (calls, rejections, errors) == (1, 0, 1)
+
+
+def test_profiled_multi_pattern():
+    profiler = MatchProfiler(label=lambda p: p.name)
+    p1 = ObjectPattern({'obj': {'eval': [IsInstance(int)]}, 'obj.real': {'bind': {'x': None}}})
+    p2 = ObjectPattern({'obj': {'eval': [IsInstance(str)]}, 'obj.upper': {'bind': {'x': None}}})
+    p1.name, p2.name = 'int', 'str'
+    for strategy in ObjectMultiPattern.STRATEGIES:
+        x = None
+        with ObjectMultiPattern(5, p1, p2, strategy=strategy, profiler=profiler):
+            assert x == 5
+    assert profiler.patterns['int']['wins'] == 3 and profiler.patterns['str']['wins'] == 0
+    assert profiler.patterns['str']['rejections'] == {'obj: IsInstance(str)': 1}
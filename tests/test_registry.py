@@ -0,0 +1,49 @@
+# pylint: disable=undefined-variable
+import pytest
+
+from pyopm.core import ObjectPattern
+from pyopm.predicates import Eq, In, IsInstance
+from pyopm.registry import PatternRegistry
+
+
+class Event:
+    # pylint: disable=too-few-public-methods,missing-class-docstring
+    def __init__(self, event_type, payload=None):
+        self.event_type, self.payload = event_type, payload
+
+
+def event_pattern(event_type, name):
+    return ObjectPattern({'obj': {'eval': [IsInstance(Event)]},
+                          'obj.event_type': {'eval': [Eq(event_type)]},
+                          'obj.payload': {'bind': {name: None}}})
+
+
+def test_registry_index():
+    patterns = [event_pattern(f'type{i}', f'p{i}') for i in range(3000)]
+    catch_all = ObjectPattern({'obj.payload': {'eval': [lambda p: p == 'special']}})
+    multi = ObjectPattern({'obj.event_type': {'eval': [In(['type7', 'other'])]}})
+    reg = PatternRegistry(patterns)
+    reg.add(catch_all)
+    reg.add(multi)
+    assert len(reg) == 3002
+    assert reg.indexed_paths == {'obj.event_type': 3001}
+    assert reg.candidates(Event('type5')) == [patterns[5], catch_all]
+    assert reg.candidates(Event('type7')) == [patterns[7], catch_all, multi]
+    assert reg.candidates(None) == [catch_all]
+    assert reg.candidates(Event(['unhashable'])) == [catch_all]
+    assert [m.bound for m in reg.match(Event('type5', 'special'))] == [{'p5': 'special'}, {}]
+    assert reg.first_match(Event('other')).pattern is multi
+    assert reg.first_match(Event('nope')) is None
+
+    reg.remove(patterns[5])
+    assert patterns[5] not in reg
+    assert reg.candidates(Event('type5')) == [catch_all]
+    reg.add(patterns[5])
+    assert reg.candidates(Event('type5')) == [catch_all, patterns[5]]
+    for p in patterns:
+        reg.remove(p)
+    reg.remove(multi)
+    assert reg.indexed_paths == {}
+    with pytest.raises(KeyError):
+        reg.remove(multi)
+    reg.discard(multi)